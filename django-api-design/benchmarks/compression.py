@@ -0,0 +1,85 @@
+"""
+Benchmark for gzip compression of sync_data payloads
+
+Builds a synthetic sync_data upload shaped like the mobile app's and reports
+bytes saved and CPU spent compressing and inflating it at several gzip levels.
+Uses only the standard library:
+
+    python benchmarks/compression.py --points 5000 --repeat 20
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+
+
+def build_payload(points, farms=3, seed=42):
+    """
+    Build a sync_data payload with the given number of observation points.
+    """
+    rng = random.Random(seed)
+    suggestions = [
+        {
+            'id': farm_id,
+            'target_entity': 'Fruit Fly',
+            'confidence_level': 'High',
+            'property_location': farm_id,
+            'area_size': round(rng.uniform(1, 50), 2),
+            'density_of_plant': rng.randint(100, 2000),
+        }
+        for farm_id in range(1, farms + 1)
+    ]
+    observation_points = []
+    for mobile_id in range(1, points + 1):
+        farm_id = rng.randint(1, farms)
+        observation_points.append({
+            'id': mobile_id,
+            'farm_id': farm_id,
+            'latitude': round(-12.46 + rng.uniform(-0.01, 0.01), 7),
+            'longitude': round(130.84 + rng.uniform(-0.01, 0.01), 7),
+            'observation_status': rng.choice(['Nil', 'Nil', 'Nil', 'Completed']),
+            'name': f'Point {mobile_id}',
+            'segment': rng.randint(1, 12),
+            'inspection_suggestion_id': farm_id,
+            'confidence_level': 'High',
+            'target_entity': 'Fruit Fly',
+        })
+    return {
+        'inspection_suggestions': suggestions,
+        'observation_points': observation_points,
+    }
+
+
+def measure(function, repeat):
+    """
+    Return the mean CPU seconds spent per call of function.
+    """
+    start = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--points', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 6, 9])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'points':>8} {'level':>5} {'raw KB':>9} {'gzip KB':>9} {'saved':>7} "
+          f"{'compress ms':>12} {'inflate ms':>11}")
+    for points in args.points:
+        raw = json.dumps(build_payload(points)).encode('utf-8')
+        for level in args.levels:
+            compressed = gzip.compress(raw, compresslevel=level, mtime=0)
+            compress_s = measure(lambda: gzip.compress(raw, compresslevel=level, mtime=0), args.repeat)
+            inflate_s = measure(lambda: gzip.decompress(compressed), args.repeat)
+            print(f"{points:>8} {level:>5} {len(raw) / 1024:>9.1f} {len(compressed) / 1024:>9.1f} "
+                  f"{1 - len(compressed) / len(raw):>7.1%} {compress_s * 1000:>12.2f} {inflate_s * 1000:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
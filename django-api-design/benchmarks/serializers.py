@@ -0,0 +1,139 @@
+"""
+Benchmark for the fast read serializers (management/commands/bench_serializers.py)
+
+Renders the same observation points and inspection suggestions to JSON
+through the DRF ModelSerializers and through ValuesSerializer, fails if the
+bytes differ, and reports the CPU time of each path:
+
+    python manage.py bench_serializers --rows 100 1000 10000 --repeat 10
+    python manage.py bench_serializers --rows 5000 --from-db
+
+By default rows are built in memory, which times serialization and rendering
+alone. --from-db reads the oldest rows of each table from the configured
+database instead, so fetching instances is timed against fetching tuples.
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import ValuesSerializer
+from api.models import InspectionSuggestion, ObservationPoint
+from api.serializers import InspectionSuggestionSerializer, ObservationPointSerializer
+
+
+def build_observation_points(count, rng, now):
+    """
+    Build unsaved observation points shaped like synced ones.
+    """
+    return [
+        ObservationPoint(
+            id=pk,
+            farm_id=rng.randint(1, 4),
+            latitude=round(-12.46 + rng.uniform(-0.01, 0.01), 7),
+            longitude=round(130.84 + rng.uniform(-0.01, 0.01), 7),
+            observation_status=rng.choice(['Nil', 'Nil', 'Nil', 'Completed']),
+            name=f'Point {pk}',
+            segment=rng.randint(1, 12),
+            created_at=now - timedelta(days=rng.randint(1, 90)),
+            updated_at=now - timedelta(seconds=rng.randint(0, 86400), microseconds=rng.randint(0, 999999)),
+            inspection_suggestion_id=rng.choice([None, rng.randint(1, 4)]),
+            confidence_level='High',
+            target_entity='Fruit Fly',
+            mobile_id=pk,
+            version=rng.randint(1, 5),
+            last_synced=rng.choice([None, now]),
+            sync_status='synced',
+        )
+        for pk in range(1, count + 1)
+    ]
+
+
+def build_inspection_suggestions(count, rng, now):
+    """
+    Build unsaved inspection suggestions shaped like synced ones.
+    """
+    return [
+        InspectionSuggestion(
+            id=pk,
+            target_entity='Fruit Fly',
+            confidence_level=rng.choice(['Low', 'Medium', 'High']),
+            property_location_id=rng.randint(1, 4),
+            area_size=float(rng.randint(1, 50)),
+            density_of_plant=rng.randint(100, 2000),
+            created_at=now - timedelta(days=rng.randint(1, 90)),
+            updated_at=now - timedelta(seconds=rng.randint(0, 86400)),
+            user_id=1,
+            mobile_id=pk,
+            version=1,
+            last_synced=now,
+            sync_status='synced',
+        )
+        for pk in range(1, count + 1)
+    ]
+
+
+def measure(function, repeat):
+    """
+    Return the output of function and the mean CPU seconds spent per call.
+    """
+    start = time.process_time()
+    for _ in range(repeat):
+        output = function()
+    return output, (time.process_time() - start) / repeat
+
+
+class Command(BaseCommand):
+    """
+    Compare ModelSerializer and ValuesSerializer output and speed.
+    """
+    help = 'Benchmark the fast read serializers against the ModelSerializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Row counts to benchmark.')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--from-db', action='store_true',
+                            help='Read rows from the database instead of building them in memory.')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+
+        self.stdout.write(f"{'entity':<24} {'rows':>7} {'model ms':>10} {'fast ms':>9} {'speedup':>8}")
+        for entity, serializer_class, build in (
+            ('observation_points', ObservationPointSerializer, build_observation_points),
+            ('inspection_suggestions', InspectionSuggestionSerializer, build_inspection_suggestions),
+        ):
+            values_serializer = ValuesSerializer(serializer_class)
+            for count in options['rows']:
+                if options['from_db']:
+                    queryset = serializer_class.Meta.model.objects.order_by('updated_at', 'id')
+                    instances = queryset[:count]
+                    rows = values_serializer.rows(queryset)[:count]
+                    run_model = lambda: renderer.render(serializer_class(list(instances.iterator()), many=True).data)
+                    run_fast = lambda: renderer.render(values_serializer.serialize(rows.iterator()))
+                else:
+                    instances = build(count, rng, now)
+                    rows = [
+                        tuple(getattr(obj, column) for column in values_serializer.columns)
+                        for obj in instances
+                    ]
+                    run_model = lambda: renderer.render(serializer_class(instances, many=True).data)
+                    run_fast = lambda: renderer.render(values_serializer.serialize(rows))
+
+                model_output, model_s = measure(run_model, options['repeat'])
+                fast_output, fast_s = measure(run_fast, options['repeat'])
+                if fast_output != model_output:
+                    raise CommandError(f'{entity}: ValuesSerializer output differs from {serializer_class.__name__}')
+
+                self.stdout.write(
+                    f"{entity:<24} {count:>7} {model_s * 1000:>10.2f} {fast_s * 1000:>9.2f} "
+                    f"{model_s / max(fast_s, 1e-9):>7.1f}x"
+                )
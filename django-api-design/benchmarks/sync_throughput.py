@@ -0,0 +1,362 @@
+"""
+Benchmark suite for sync throughput (management/commands/bench_sync.py)
+
+Generates synthetic users, farms, boundary points, observation points and
+inspection suggestions at configurable sizes, drives the sync endpoints
+through the full Django/DRF stack against the configured local database,
+and writes one JSON record per scenario and size:
+
+    python manage.py bench_sync --sizes 10 1000 100000 --output bench_sync.json
+    python manage.py bench_sync --baseline bench_sync.json
+
+Each record reports rows/sec, p50/p99 request latency, SQL queries per
+request and peak Python memory. Benchmark users are deleted afterwards
+unless --keep is given.
+"""
+
+import json
+import math
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import BoundaryPoint, Farm, InspectionSuggestion, ObservationPoint
+
+# Keeps synthetic mobile ids clear of ids issued by real devices
+MOBILE_ID_BASE = 1_500_000_000
+
+
+# Synthetic data
+class SyntheticFarmGenerator:
+    """
+    Generator for benchmark users, farms and sync payloads.
+
+    Farms are squares around a fixed origin; observation points form a grid
+    inside them, split into segments the way the mobile app lays them out.
+    """
+
+    def __init__(self, seed=42, farms_per_user=4, segments=12):
+        self.rng = random.Random(seed)
+        self.farms_per_user = farms_per_user
+        self.segments = segments
+        self.next_mobile_id = MOBILE_ID_BASE + self.rng.randrange(0, 100_000_000)
+
+    def take_mobile_ids(self, count):
+        start = self.next_mobile_id
+        self.next_mobile_id += count
+        return range(start, start + count)
+
+    def create_user(self):
+        """
+        Create a benchmark user with farms, boundary points and one suggestion per farm.
+        """
+        user = User.objects.create_user(
+            username=f'bench-{uuid.uuid4().hex[:12]}',
+            password=uuid.uuid4().hex
+        )
+        farms = []
+        for index in range(self.farms_per_user):
+            farm = Farm.objects.create(
+                user=user,
+                name=f'Bench Farm {index + 1}',
+                size=round(self.rng.uniform(1, 50), 2),
+                plant_type='Mango'
+            )
+            BoundaryPoint.objects.bulk_create([
+                BoundaryPoint(farm=farm, latitude=latitude, longitude=longitude)
+                for latitude, longitude in self.boundary(index)
+            ])
+            InspectionSuggestion.objects.create(
+                user=user,
+                property_location=farm,
+                target_entity='Fruit Fly',
+                confidence_level='High',
+                area_size=farm.size,
+                density_of_plant=self.rng.randint(100, 2000)
+            )
+            farms.append(farm)
+        return user, farms
+
+    def boundary(self, index, size=0.01):
+        """
+        Return the corners of the index-th farm's square boundary.
+        """
+        latitude = -12.46 + index * size * 2
+        longitude = 130.84
+        return [
+            (latitude, longitude),
+            (latitude + size, longitude),
+            (latitude + size, longitude + size),
+            (latitude, longitude + size),
+        ]
+
+    def observation_points(self, farms, count):
+        """
+        Return count observation point rows as the mobile app uploads them.
+        """
+        rows = []
+        per_farm = math.ceil(count / len(farms))
+        side = max(1, math.ceil(math.sqrt(per_farm)))
+        mobile_ids = iter(self.take_mobile_ids(count))
+        for farm_index, farm in enumerate(farms):
+            (south, west), _, (north, east), _ = self.boundary(farm_index)
+            for cell in range(min(per_farm, count - len(rows))):
+                row, column = divmod(cell, side)
+                rows.append({
+                    'id': next(mobile_ids),
+                    'farm_id': farm.id,
+                    'latitude': round(south + (north - south) * (row + 0.5) / side, 7),
+                    'longitude': round(west + (east - west) * (column + 0.5) / side, 7),
+                    'observation_status': 'Nil',
+                    'name': f'Point {cell + 1}',
+                    'segment': cell * self.segments // per_farm + 1,
+                    'confidence_level': 'High',
+                    'target_entity': 'Fruit Fly',
+                })
+        return rows
+
+    def inspection_suggestions(self, farms, count):
+        """
+        Return count inspection suggestion rows spread across farms.
+        """
+        return [
+            {
+                'id': mobile_id,
+                'property_location': farms[index % len(farms)].id,
+                'target_entity': 'Fruit Fly',
+                'confidence_level': self.rng.choice(['Low', 'Medium', 'High']),
+                'area_size': round(self.rng.uniform(1, 50), 2),
+                'density_of_plant': self.rng.randint(100, 2000),
+            }
+            for index, mobile_id in enumerate(self.take_mobile_ids(count))
+        ]
+
+
+# Measurement
+def percentile(values, fraction):
+    """
+    Return the nearest-rank percentile of values.
+    """
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Recorder:
+    """
+    Collects latency and query counts for the requests of one scenario.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.query_counts = []
+
+    def call(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = function()
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            self.latencies.append(time.perf_counter() - start)
+        self.query_counts.append(len(queries))
+        if response.status_code >= 400:
+            raise RuntimeError(f'Request failed with {response.status_code}: {response.content[:500]!r}')
+        return response
+
+    def summary(self, rows):
+        elapsed = sum(self.latencies)
+        return {
+            'requests': len(self.latencies),
+            'rows': rows,
+            'seconds': round(elapsed, 4),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+            'p50_ms': round(percentile(self.latencies, 0.50) * 1000, 2),
+            'p99_ms': round(percentile(self.latencies, 0.99) * 1000, 2),
+            'queries_per_request_mean': round(statistics.mean(self.query_counts), 2),
+            'queries_per_request_max': max(self.query_counts),
+        }
+
+
+def peak_memory(function):
+    """
+    Run function and return the peak Python memory it allocated, in KiB.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+# Scenarios
+def push(client, url, key, rows, batch_size):
+    """
+    Return a callable that uploads rows to url in batches, recording each request.
+    """
+    def run(recorder):
+        for start in range(0, len(rows), batch_size):
+            recorder.call(lambda: client.post(
+                url,
+                {key: rows[start:start + batch_size]},
+                format='json'
+            ))
+    return run
+
+
+def pull(client, url, page_size, accept='application/json'):
+    """
+    Return a callable that walks every pending_sync page of url, recording each request.
+    """
+    def run(recorder):
+        # Measure the database path, not the pending_sync cache
+        caches[getattr(settings, 'SYNC_CACHE_ALIAS', 'sync')].clear()
+        cursor = None
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            response = recorder.call(lambda: client.get(url, params, HTTP_ACCEPT=accept))
+            if accept != 'application/json':
+                return
+            body = response.json()
+            cursor = body['next_cursor']
+            if not body['has_more']:
+                return
+    return run
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the sync endpoints at several dataset sizes.
+    """
+    help = 'Benchmark sync push and pull throughput against the local database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                            help='Observation point counts to benchmark (10 to 100000).')
+        parser.add_argument('--farms', type=int, default=4, help='Farms per benchmark user.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per push request.')
+        parser.add_argument('--page-size', type=int, default=500, help='Rows per pending_sync page.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='bench_sync.json', help='Where to write JSON results.')
+        parser.add_argument('--baseline', help='Earlier results file to compare rows/sec against.')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark users and rows.')
+
+    def handle(self, *args, **options):
+        generator = SyntheticFarmGenerator(seed=options['seed'], farms_per_user=options['farms'])
+        client = APIClient(SERVER_NAME='localhost')
+        users = []
+        results = []
+
+        try:
+            for size in options['sizes']:
+                user, farms = generator.create_user()
+                users.append(user)
+                client.force_authenticate(user)
+                for scenario, run, rows in self.scenarios(client, generator, farms, size, options):
+                    results.append(self.measure(scenario, size, run, rows))
+        finally:
+            client.force_authenticate(None)
+            if not options['keep']:
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'options': {k: options[k] for k in ('sizes', 'farms', 'batch_size', 'page_size', 'seed')},
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f"Wrote {len(results)} results to {options['output']}")
+
+        if options['baseline']:
+            self.compare(options['baseline'], results)
+
+    def scenarios(self, client, generator, farms, size, options):
+        """
+        Yield (name, run, rows) for every scenario at the given size.
+
+        Each push scenario's timed run uploads fresh rows and so exercises the
+        create path; sync_data_update re-sends the same rows to time the
+        update path. Pulls walk everything the pushes stored.
+        """
+        batch_size = options['batch_size']
+        page_size = options['page_size']
+
+        def fresh_points():
+            return generator.observation_points(farms, size)
+
+        points = fresh_points()
+        yield ('sync_data', push(client, reverse('sync-data'), 'observation_points', points, batch_size), len(points))
+        yield ('sync_data_update', push(client, reverse('sync-data'), 'observation_points', points, batch_size), len(points))
+
+        points = fresh_points()
+        url = reverse('observation-point-sync')
+        yield ('observation_points_sync', push(client, url, 'observation_points', points, batch_size), len(points))
+
+        suggestion_count = max(1, size // 100)
+        suggestions = generator.inspection_suggestions(farms, suggestion_count)
+        url = reverse('inspection-suggestion-sync')
+        yield ('inspection_suggestions_sync', push(client, url, 'inspection_suggestions', suggestions, batch_size), suggestion_count)
+
+        stored = ObservationPoint.objects.filter(farm__in=farms).count()
+        url = reverse('observation-point-pending-sync')
+        yield ('observation_points_pending_sync', pull(client, url, page_size), stored)
+        yield ('observation_points_pending_sync_ndjson', pull(client, url, page_size, 'application/x-ndjson'), stored)
+
+        stored = InspectionSuggestion.objects.filter(property_location__in=farms).count()
+        url = reverse('inspection-suggestion-pending-sync')
+        yield ('inspection_suggestions_pending_sync', pull(client, url, page_size), stored)
+
+    def measure(self, scenario, size, run, rows):
+        recorder = Recorder()
+        run(recorder)
+        summary = recorder.summary(rows)
+        # Replay separately under tracemalloc so its overhead stays out of the
+        # timings; for push scenarios the replay takes the update path
+        summary['peak_memory_kib'] = peak_memory(lambda: run(Recorder()))
+        record = {'scenario': scenario, 'size': size, **summary}
+        self.stdout.write(
+            f"{scenario:<40} {size:>7} rows/s={record['rows_per_sec']} "
+            f"p50={record['p50_ms']}ms p99={record['p99_ms']}ms "
+            f"queries/req={record['queries_per_request_mean']} peak={record['peak_memory_kib']}KiB"
+        )
+        return record
+
+    def compare(self, baseline_path, results):
+        """
+        Print the rows/sec change of each scenario against a baseline file.
+        """
+        with open(baseline_path) as baseline_file:
+            baseline = {
+                (record['scenario'], record['size']): record
+                for record in json.load(baseline_file)['results']
+            }
+        for record in results:
+            before = baseline.get((record['scenario'], record['size']))
+            if not before or not before['rows_per_sec'] or not record['rows_per_sec']:
+                continue
+            change = record['rows_per_sec'] / before['rows_per_sec'] - 1
+            self.stdout.write(
+                f"{record['scenario']:<40} {record['size']:>7} rows/s {change:+.1%} "
+                f"queries/req {before['queries_per_request_mean']} -> {record['queries_per_request_mean']}"
+            )
@@ -0,0 +1,183 @@
+"""
+Django API Design for Bulk Sync Helpers
+
+This file outlines the helpers shared by the sync endpoints to resolve
+lookups and write rows in a constant number of queries per batch.
+"""
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+
+def get_batch_size():
+    """
+    Return the number of rows written per bulk INSERT/UPDATE statement.
+    """
+    return getattr(settings, 'SYNC_BULK_BATCH_SIZE', 500)
+
+
+def coerce_id(value):
+    """
+    Normalize a client-supplied id to an int, or None if it is not one.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def in_bulk_by(queryset, field_name, values):
+    """
+    Fetch the rows of queryset whose field_name is in values with one query.
+
+    Returns a dict mapping each found value to its model instance.
+    """
+    values = {value for value in values if value is not None}
+    if not values:
+        return {}
+    return queryset.filter(**{f'{field_name}__in': values}).in_bulk(field_name=field_name)
+
+
+def field_values(obj):
+    """
+    Snapshot the concrete field values of obj, keyed by attname.
+    """
+    return {field.attname: getattr(obj, field.attname) for field in obj._meta.concrete_fields}
+
+
+def changed_fields(obj, before):
+    """
+    Return the names of the concrete fields of obj that differ from a field_values snapshot.
+    """
+    return {
+        field.name for field in obj._meta.concrete_fields
+        if getattr(obj, field.attname) != before[field.attname]
+    }
+
+
+class VersionConflict:
+    """
+    Error recorded by bulk_write for a row whose version moved on since it was read.
+    """
+
+    def __init__(self, server_version):
+        # None if the row has been deleted meanwhile
+        self.server_version = server_version
+
+
+def get_commit_chunk_size():
+    """
+    Return the number of rows committed per transaction by the sync endpoints.
+    """
+    return getattr(settings, 'SYNC_COMMIT_CHUNK_SIZE', 1000)
+
+
+def chunks(rows, size):
+    """
+    Split rows into consecutive lists of at most size items.
+    """
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+def bulk_write(model, to_create, to_update, update_fields, on_write=None, version_field=None):
+    """
+    Persist staged rows with bulk_create/bulk_update.
+
+    Rows are committed in chunks of SYNC_COMMIT_CHUNK_SIZE, so large uploads
+    hold short locks. bulk_update skips Field.pre_save, so auto_now fields are
+    stamped here to keep updated_at-based pulls working. If a bulk statement
+    fails, its chunk is replayed row by row inside savepoints so one bad row
+    only fails itself.
+
+    Bulk statements bypass model signals, so on_write, if given, is called
+    with the created and updated rows inside each chunk's transaction.
+    Replayed rows are saved one by one and fire the signals themselves.
+
+    With version_field, updated rows are only written if the database still
+    holds the version they were read at, and that version is incremented.
+
+    Returns a dict mapping id(instance) to an error message for failed rows,
+    or to a VersionConflict for rows that lost a version check.
+    """
+    auto_now_fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+    ]
+    for obj in to_update:
+        for field in auto_now_fields:
+            field.pre_save(obj, add=False)
+    update_fields = list(dict.fromkeys([
+        *update_fields,
+        *(field.name for field in auto_now_fields),
+        *([version_field] if version_field else []),
+    ]))
+
+    errors = {}
+    chunk_size = get_commit_chunk_size()
+    for chunk in chunks(to_create, chunk_size):
+        errors.update(_write_chunk(model, chunk, [], update_fields, on_write, version_field))
+    for chunk in chunks(to_update, chunk_size):
+        errors.update(_write_chunk(model, [], chunk, update_fields, on_write, version_field))
+    return errors
+
+
+def _write_chunk(model, to_create, to_update, update_fields, on_write=None, version_field=None):
+    """
+    Write one chunk of rows in its own transaction.
+    """
+    batch_size = get_batch_size()
+    errors = {}
+    with transaction.atomic():
+        if version_field is not None and to_update:
+            to_update = _claim_versions(model, to_update, version_field, errors)
+        try:
+            with transaction.atomic():
+                if to_create:
+                    model.objects.bulk_create(to_create, batch_size=batch_size)
+                if to_update:
+                    model.objects.bulk_update(to_update, update_fields, batch_size=batch_size)
+                if on_write is not None:
+                    on_write(to_create, to_update)
+            return errors
+        except DatabaseError:
+            pass
+
+        # Replay row by row so the failure is attributed to the offending row
+        for obj in to_create:
+            obj.pk = None
+            try:
+                with transaction.atomic():
+                    obj.save(force_insert=True)
+            except DatabaseError as e:
+                obj.pk = None
+                errors[id(obj)] = str(e)
+        for obj in to_update:
+            try:
+                with transaction.atomic():
+                    obj.save(update_fields=update_fields)
+            except DatabaseError as e:
+                errors[id(obj)] = str(e)
+    return errors
+
+
+def _claim_versions(model, rows, version_field, errors):
+    """
+    Lock rows and keep those still at the version they were read at, bumping it.
+
+    This is UPDATE ... WHERE version = <read version> for a whole chunk: one
+    locking SELECT checks every row, so the write itself stays a bulk_update.
+    """
+    current = dict(
+        model.objects.select_for_update()
+        .filter(pk__in=[obj.pk for obj in rows])
+        .values_list('pk', version_field)
+    )
+    claimed = []
+    for obj in rows:
+        read_version = getattr(obj, version_field)
+        if current.get(obj.pk) != read_version:
+            errors[id(obj)] = VersionConflict(current.get(obj.pk))
+            continue
+        setattr(obj, version_field, read_version + 1)
+        claimed.append(obj)
+    return claimed
@@ -0,0 +1,110 @@
+"""
+Django API Design for Cached Token Authentication
+
+This file outlines a drop-in replacement for DRF's TokenAuthentication that
+keeps resolved tokens in the `auth` cache for AUTH_TOKEN_CACHE_TTL seconds,
+so polling clients such as pending_sync skip the token/user join. The cache
+is shared by every worker process (Redis in main_api_config.py), so a
+revocation handled by one worker reaches the others at once.
+
+Each token has a generation entry next to its cached resolution. Logging out
+(deleting the token), and any save of the user (password change,
+deactivation), replace the generation, which makes the cached resolution
+unreachable. The generation is read before the database lookup and
+replaced both immediately and after commit. A request that races a
+revocation therefore cannot cache the old state under the new generation.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'auth')]
+
+
+def _keys(token_key):
+    """
+    Return the cache keys of a token's resolution and generation.
+
+    Tokens are hashed so raw credentials never appear in the cache.
+    """
+    digest = hashlib.sha256(token_key.encode('utf-8')).hexdigest()
+    return f'auth-token:{digest}', f'auth-token:generation:{digest}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that serves resolved tokens from a cache.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        entry_key, generation_key = _keys(key)
+        values = cache.get_many([entry_key, generation_key])
+        entry = values.get(entry_key)
+        generation = values.get(generation_key)
+        if entry is not None and generation is not None and entry['generation'] == generation:
+            return entry['token'].user, entry['token']
+
+        # Read the generation before the database, so a concurrent revocation wins
+        if generation is None:
+            cache.add(generation_key, uuid.uuid4().hex, timeout=None)
+            generation = cache.get(generation_key)
+
+        # Raises AuthenticationFailed for unknown tokens and inactive users
+        user, token = super().authenticate_credentials(key)
+        cache.set(
+            entry_key,
+            {'generation': generation, 'token': token},
+            getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300)
+        )
+        return user, token
+
+
+def invalidate_tokens(*token_keys):
+    """
+    Make the cached resolutions of token_keys unreachable, now and after commit.
+    """
+    if not token_keys:
+        return
+
+    def bump():
+        get_cache().set_many(
+            {_keys(token_key)[1]: uuid.uuid4().hex for token_key in token_keys},
+            timeout=None
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_user_tokens(user_id):
+    """
+    Make every cached token resolution of a user unreachable.
+    """
+    invalidate_tokens(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+# Signals
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Logout deletes the token
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user(sender, instance, created, update_fields=None, **kwargs):
+    # Covers password changes, deactivation and any other change to the cached user.
+    # A stale last_login, as written on every login, is harmless.
+    if created or update_fields == frozenset(['last_login']):
+        return
+    invalidate_user_tokens(instance.pk)
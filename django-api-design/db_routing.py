@@ -0,0 +1,116 @@
+"""
+Django API Design for Read-Replica Routing
+
+This file outlines the database router and middleware that send the reads of
+safe requests (pending_sync, list and profile GETs) to the aliases listed in
+REPLICA_DATABASES, while writes, and every read outside a safe request, stay
+on the primary. Workers and management commands therefore always use the
+primary.
+
+After an unsafe request, the caller's token is pinned to the primary for
+REPLICA_STICKY_SECONDS, so a device reads its own sync POST back even while
+the replicas lag. The pin lives in the REPLICA_STICKY_CACHE_ALIAS cache,
+which must be shared between worker processes; the middleware refuses to
+start with a per-process one.
+
+Locally, the replica alias can point at the primary database (see
+DATABASES in main_api_config.py) to exercise the routing with two aliases.
+"""
+
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+# Tokens and users are read on every authenticated request right after login,
+# before a replica may have them; the token cache keeps these reads cheap
+PRIMARY_ONLY_APPS = {'auth', 'authtoken'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+class ReplicaRouter:
+    """
+    Route reads to a random replica while the current request allows it.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction on the primary must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = get_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # A request that writes reads its own writes from then on
+        _replica_reads.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+def _sticky_key(request):
+    """
+    Return the stickiness cache key for the request's credentials, or None.
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    digest = hashlib.sha256(authorization.encode('utf-8')).hexdigest()
+    return f'db-sticky:{digest}'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Allow replica reads for safe requests whose caller has not written recently.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        alias = getattr(settings, 'REPLICA_STICKY_CACHE_ALIAS', 'default')
+        # A pin kept in one process would not stop the caller's next request
+        # to another process from reading a lagging replica
+        if get_replicas() and isinstance(caches[alias], (LocMemCache, DummyCache)):
+            raise ImproperlyConfigured(
+                f'REPLICA_STICKY_CACHE_ALIAS ({alias!r}) must name a cache shared between worker processes'
+            )
+        self.cache_alias = alias
+
+    def __call__(self, request):
+        cache = caches[self.cache_alias]
+        key = _sticky_key(request)
+        safe = request.method in self.safe_methods
+
+        _replica_reads.set(safe and not (key and cache.get(key)))
+        response = self.get_response(request)
+
+        if not safe and key:
+            cache.set(key, True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+        return response
+
+
+@receiver(request_finished)
+def reset_replica_reads(sender, **kwargs):
+    # Sent once the response is closed, so streamed pulls keep reading from the replica
+    _replica_reads.set(False)
@@ -0,0 +1,334 @@
+"""
+Django API Design for Farm Summaries
+
+This file outlines the per-farm observation point counts behind the farm
+overview and history screens. FarmPointCount holds one row per farm and
+(observation_status, target_entity, confidence_level) combination. The write
+paths keep it current in the same transaction as the points, so
+GET /api/farm-summaries/ reads a handful of rows however many points a farm
+has, instead of grouping the points on every request.
+
+Saves and single-row deletes are counted through signals, against the
+values each point was loaded with. Bulk writes bypass signals, so their
+callers account for them: bulk_write callers pass update_point_summaries to
+on_write, QuerySet.update() callers pass the moved counts to apply_deltas,
+and bulk deletes rebuild the farm with rebuild_farm_summary. Writers lock
+the points before the summary rows, and the summary rows through
+lock_summary_rows, so concurrent writers do not deadlock. The sync workers
+run reconcile_farm_summaries every FARM_SUMMARY_RECONCILE_INTERVAL to
+correct any drift left by writes outside these paths.
+"""
+
+# Models
+from django.db import models
+
+class FarmPointCount(models.Model):
+    """
+    Model for the number of a farm's observation points sharing a status, target and confidence.
+    """
+    # Indexed by the leading column of farm_point_count_key
+    farm = models.ForeignKey('Farm', on_delete=models.CASCADE, related_name='point_counts', db_index=False)
+    observation_status = models.CharField(max_length=50)
+    # Blank where the points have none, so the unique constraint covers them too
+    target_entity = models.CharField(max_length=255, blank=True)
+    confidence_level = models.CharField(max_length=50, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['farm', 'observation_status', 'target_entity', 'confidence_level'],
+                name='farm_point_count_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Farm {self.farm_id} - {self.observation_status} - {self.count}"
+
+
+# Counting
+import logging
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F
+
+logger = logging.getLogger('api')
+
+# Key of a point whose summary fields were not all loaded
+UNKNOWN = object()
+
+# Order of a farm's summary rows in responses
+SUMMARY_ORDER = ('observation_status', 'target_entity', 'confidence_level')
+
+_last_reconciliation = 0.0
+
+
+def summary_key(point):
+    """
+    Return the (farm_id, status, target, confidence) row a point counts towards.
+
+    Returns UNKNOWN if any of those fields is deferred, rather than loading it.
+    """
+    values = point.__dict__
+    if any(name not in values for name in ('farm_id', 'observation_status', 'target_entity', 'confidence_level')):
+        return UNKNOWN
+    return (
+        values['farm_id'],
+        values['observation_status'],
+        values['target_entity'] or '',
+        values['confidence_level'] or '',
+    )
+
+
+def lock_summary_rows(farm_ids):
+    """
+    Lock and return the summary rows of farm_ids, in primary key order.
+
+    Every writer locks a farm's rows this way before changing its counts,
+    so they queue behind each other instead of deadlocking. The order is
+    the primary key's rather than the keys', which the database and Python
+    would not collate alike.
+    """
+    return list(FarmPointCount.objects.select_for_update().filter(farm_id__in=farm_ids).order_by('pk'))
+
+
+def apply_deltas(deltas):
+    """
+    Add each count in deltas to the summary row of its (farm_id, status, target, confidence) key.
+
+    The farms' rows are locked with lock_summary_rows first. Missing rows
+    are created in sorted key order, so writers creating the same rows wait
+    on them in the same order.
+    """
+    keys = sorted(key for key, delta in deltas.items() if delta)
+    if not keys:
+        return
+    with transaction.atomic():
+        stored = {
+            (row.farm_id, row.observation_status, row.target_entity, row.confidence_level): row
+            for row in lock_summary_rows({key[0] for key in keys})
+        }
+        for key in keys:
+            farm_id, observation_status, target_entity, confidence_level = key
+            delta = deltas[key]
+            row = stored.get(key)
+            if row is not None:
+                FarmPointCount.objects.filter(pk=row.pk).update(count=F('count') + delta)
+                continue
+            if delta < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    FarmPointCount.objects.create(
+                        farm_id=farm_id,
+                        observation_status=observation_status,
+                        target_entity=target_entity,
+                        confidence_level=confidence_level,
+                        count=delta
+                    )
+            except IntegrityError:
+                # Another writer created the row since the rows were locked
+                FarmPointCount.objects.filter(
+                    farm_id=farm_id,
+                    observation_status=observation_status,
+                    target_entity=target_entity,
+                    confidence_level=confidence_level
+                ).update(count=F('count') + delta)
+
+
+def update_point_summaries(created, updated=()):
+    """
+    Move written points from the summary rows they were loaded with to their current ones.
+
+    Takes the same arguments as bulk_write's on_write, and must run in the
+    transaction that wrote the points.
+    """
+    writes = [(point, None) for point in created]
+    writes += [(point, getattr(point, '_summary_key', UNKNOWN)) for point in updated]
+
+    deltas = Counter()
+    moved = []
+    for point, old_key in writes:
+        new_key = summary_key(point)
+        if old_key is UNKNOWN or new_key is UNKNOWN or old_key == new_key:
+            continue
+        if old_key is not None:
+            deltas[old_key] -= 1
+        deltas[new_key] += 1
+        moved.append((point, new_key))
+
+    apply_deltas(deltas)
+    for point, new_key in moved:
+        point._summary_key = new_key
+
+
+def rebuild_farm_summary(farm_id):
+    """
+    Recount a farm's summary rows from its observation points.
+
+    Returns the number of rows whose count was wrong. Rows left at zero by
+    earlier decrements are dropped without counting as corrections.
+    """
+    ObservationPoint = apps.get_model('api', 'ObservationPoint')
+    with transaction.atomic():
+        # Writers holding these rows commit first, so the count below includes their points
+        stored = {
+            (farm_id, row.observation_status, row.target_entity, row.confidence_level): row
+            for row in lock_summary_rows([farm_id])
+        }
+        counts = Counter()
+        for observation_status, target_entity, confidence_level, count in (
+            ObservationPoint.objects.filter(farm_id=farm_id)
+            .values_list('observation_status', 'target_entity', 'confidence_level')
+            .annotate(count=Count('id'))
+            .order_by()
+        ):
+            counts[(farm_id, observation_status, target_entity or '', confidence_level or '')] += count
+
+        stale = [row for key, row in stored.items() if key not in counts]
+        changed = []
+        added = []
+        for key, count in sorted(counts.items()):
+            row = stored.get(key)
+            if row is None:
+                added.append(FarmPointCount(
+                    farm_id=farm_id,
+                    observation_status=key[1],
+                    target_entity=key[2],
+                    confidence_level=key[3],
+                    count=count
+                ))
+            elif row.count != count:
+                row.count = count
+                changed.append(row)
+
+        FarmPointCount.objects.filter(pk__in=[row.pk for row in stale]).delete()
+        FarmPointCount.objects.bulk_update(changed, ['count'])
+        # A row a writer created meanwhile is left to its delta and the next reconciliation
+        FarmPointCount.objects.bulk_create(added, ignore_conflicts=True)
+    return sum(1 for row in stale if row.count) + len(changed) + len(added)
+
+
+def reconcile_farm_summaries(force=False):
+    """
+    Rebuild every farm's summary, logging the farms that had drifted.
+
+    Runs at most once per FARM_SUMMARY_RECONCILE_INTERVAL per process unless
+    force is set. Returns the number of farms corrected.
+    """
+    global _last_reconciliation
+    interval = getattr(settings, 'FARM_SUMMARY_RECONCILE_INTERVAL', 6 * 60 * 60)
+    if not force and time.monotonic() - _last_reconciliation < interval:
+        return 0
+    _last_reconciliation = time.monotonic()
+
+    corrected = 0
+    farm_ids = apps.get_model('api', 'Farm').objects.order_by('id').values_list('id', flat=True)
+    for farm_id in farm_ids.iterator():
+        try:
+            rows = rebuild_farm_summary(farm_id)
+        except DatabaseError:
+            # Deadlocks and lock timeouts included; the next reconciliation retries the farm
+            logger.exception('Could not reconcile the summary of farm %s', farm_id)
+            continue
+        if rows:
+            logger.warning('Corrected %s drifted summary rows of farm %s', rows, farm_id)
+            corrected += 1
+    return corrected
+
+
+# Signals
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .sync_tombstones import covered_by_caller
+
+
+@receiver(post_init, sender='api.ObservationPoint')
+def remember_summary_key(sender, instance, **kwargs):
+    # The row a loaded point is counted in; unsaved points are not counted yet
+    instance._summary_key = summary_key(instance) if instance.pk is not None else None
+
+
+@receiver(post_save, sender='api.ObservationPoint')
+def count_saved_point(sender, instance, created, **kwargs):
+    if created:
+        update_point_summaries([instance])
+    else:
+        update_point_summaries([], [instance])
+
+
+@receiver(post_delete, sender='api.ObservationPoint')
+def count_deleted_point(sender, instance, origin=None, **kwargs):
+    # Deleting the farm or user removes its summary with it, and bulk deletes
+    # rebuild the farm's summary instead of decrementing it row by row
+    if covered_by_caller(origin):
+        return
+    key = getattr(instance, '_summary_key', UNKNOWN)
+    if key is not None and key is not UNKNOWN:
+        apply_deltas({key: -1})
+
+
+# Views
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .bulk_sync import coerce_id
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def farm_summaries(request):
+    """
+    Return the observation point counts of the authenticated user's farms.
+
+    ?farm=<id> limits the response to one farm. Each summary carries the
+    total, the counts by observation_status, target_entity and
+    confidence_level, and the breakdown by all three; points without a
+    target_entity or confidence_level are counted under ''. Farms without
+    points are left out. Served from FarmPointCount, so the cost depends on
+    the number of distinct combinations rather than of points.
+    """
+    rows = FarmPointCount.objects.filter(farm__user=request.user).exclude(count=0)
+    farm = request.query_params.get('farm')
+    if farm is not None:
+        farm_id = coerce_id(farm)
+        if farm_id is None:
+            return Response(
+                {'error': 'Invalid farm. Use a farm id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows = rows.filter(farm_id=farm_id)
+
+    summaries = {}
+    for farm_id, observation_status, target_entity, confidence_level, count in (
+        rows.order_by('farm_id', *SUMMARY_ORDER)
+        .values_list('farm_id', 'observation_status', 'target_entity', 'confidence_level', 'count')
+    ):
+        summary = summaries.setdefault(farm_id, {
+            'farm': farm_id,
+            'total': 0,
+            'by_observation_status': {},
+            'by_target_entity': {},
+            'by_confidence_level': {},
+            'breakdown': [],
+        })
+        summary['total'] += count
+        for field, value in (
+            ('by_observation_status', observation_status),
+            ('by_target_entity', target_entity),
+            ('by_confidence_level', confidence_level),
+        ):
+            summary[field][value] = summary[field].get(value, 0) + count
+        summary['breakdown'].append({
+            'observation_status': observation_status,
+            'target_entity': target_entity,
+            'confidence_level': confidence_level,
+            'count': count,
+        })
+
+    return Response({'results': list(summaries.values())})
@@ -0,0 +1,161 @@
+"""
+Django API Design for Fast Read Serializers
+
+This file outlines the read-only serialization path used by the bulk read
+endpoints (pending_sync, NDJSON streams, GET /api/sync/ and /api/changes/).
+A ValuesSerializer is compiled once per response from a flat ModelSerializer:
+each readable field is mapped to a database column and, where the column's
+Python value is not already its JSON representation, to a converter. Rows are
+then fetched as `.values_list()` tuples and turned into dicts without
+building model instances or running DRF's per-field machinery, and the
+rendered JSON is byte-identical to the ModelSerializer's.
+
+Serializers with nested, method, hyperlinked or dotted-source fields, or a
+custom to_representation, are rejected with TypeError; values_serializer_for
+falls back to the regular serializer for those.
+
+See benchmarks/serializers.py for the comparison against the ModelSerializers.
+"""
+
+import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+def _datetime_converter(field):
+    """
+    Return a converter equivalent to field.to_representation for database datetimes.
+
+    The output format and timezone are resolved once, when the serializer
+    is compiled, instead of for every value.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    return datetime.date.isoformat
+
+
+def _compile_field(model, field):
+    """
+    Return the (column, converter) pair for one readable serializer field.
+
+    converter is None where the column value is already its representation.
+    """
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        converter = field.pk_field.to_representation if field.pk_field is not None else None
+        return model._meta.get_field(field.source).attname, converter
+
+    # ModelField reads the whole instance, the others related rows or methods
+    if isinstance(field, (serializers.BaseSerializer, serializers.RelatedField, serializers.ManyRelatedField,
+                          serializers.SerializerMethodField, serializers.ModelField)):
+        raise TypeError(f'{field.field_name} is not read from a single column')
+    if '.' in field.source or field.source == '*':
+        raise TypeError(f'{field.field_name} is not read from a single column')
+    try:
+        column = model._meta.get_field(field.source).attname
+    except FieldDoesNotExist:
+        raise TypeError(f'{field.field_name} is not a model field')
+
+    if isinstance(field, serializers.DateTimeField):
+        return column, _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return column, _date_converter(field)
+    if isinstance(field, serializers.FloatField):
+        # Keeps whole numbers rendering as 1.0 whatever the backend returns
+        return column, float
+    if isinstance(field, (serializers.IntegerField, serializers.CharField, serializers.BooleanField)):
+        return column, None
+    if isinstance(field, serializers.ChoiceField) and all(
+        key == value for key, value in field.choice_strings_to_values.items()
+    ):
+        return column, None
+    return column, field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer that renders `.values_list()` rows like a flat ModelSerializer.
+    """
+
+    def __init__(self, serializer_class, context=None):
+        if serializer_class.to_representation is not serializers.Serializer.to_representation:
+            raise TypeError(f'{serializer_class.__name__} overrides to_representation')
+        model = serializer_class.Meta.model
+        serializer = serializer_class(context=context)
+
+        self.names = []
+        self.columns = []
+        self.converters = []
+        for index, field in enumerate(
+            field for field in serializer.fields.values() if not field.write_only
+        ):
+            column, converter = _compile_field(model, field)
+            self.names.append(field.field_name)
+            self.columns.append(column)
+            if converter is not None:
+                self.converters.append((field.field_name, index, converter))
+
+    def rows(self, queryset, extra=()):
+        """
+        Return queryset as named rows of this serializer's columns.
+
+        extra names further columns to fetch after them, such as the keyset
+        columns a paginator reads. Rows keep attribute access (row.updated_at,
+        row.id), so they page and stream like model instances.
+        """
+        extra = [column for column in extra if column not in self.columns]
+        return queryset.values_list(*self.columns, *extra, named=True)
+
+    def to_representation(self, row):
+        # zip stops at the serializer's fields, leaving out any extra columns
+        data = dict(zip(self.names, row))
+        for name, index, converter in self.converters:
+            value = row[index]
+            if value is not None:
+                data[name] = converter(value)
+        return data
+
+    def serialize(self, rows):
+        """
+        Return the representations of rows as a list.
+        """
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+    def in_bulk(self, queryset, ids):
+        """
+        Return a dict mapping each of ids found in queryset to its representation.
+        """
+        return {
+            row[0]: self.to_representation(row[1:])
+            for row in queryset.filter(pk__in=ids).values_list('pk', *self.columns)
+        }
+
+
+def values_serializer_for(serializer_class, context=None):
+    """
+    Return a ValuesSerializer for serializer_class, or None if it is not flat.
+    """
+    try:
+        return ValuesSerializer(serializer_class, context=context)
+    except TypeError:
+        return None
@@ -0,0 +1,44 @@
+"""
+Django API Design for Profile Picture Variants
+
+This file outlines the image resizing run by the profile picture worker
+pool. It deliberately imports nothing from Django so that spawned worker
+processes can load it without setting up the app registry.
+"""
+
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+# Longest edge, in pixels, of each variant advertised to clients
+PROFILE_PICTURE_VARIANTS = {
+    'thumbnail': 128,
+    'medium': 512,
+}
+
+
+def variant_path(source_path, variant):
+    """
+    Return where the given variant of source_path is written.
+    """
+    source = Path(source_path)
+    return str(source.parent / 'variants' / f'{source.stem}_{variant}.jpg')
+
+
+def render_variants(source_path, variants=PROFILE_PICTURE_VARIANTS, quality=85):
+    """
+    Write a resized JPEG of source_path for every variant.
+
+    Returns a dict mapping each variant name to the path it was written to.
+    """
+    paths = {}
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for name, size in variants.items():
+            target = variant_path(source_path, name)
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            resized.save(target, 'JPEG', quality=quality, optimize=True, progressive=True)
+            paths[name] = target
+    return paths
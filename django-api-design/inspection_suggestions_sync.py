@@ -20,10 +20,13 @@ class InspectionSuggestion(models.Model):
     density_of_plant = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inspection_suggestions')
+    # Indexed by the leading column of insp_sugg_user_sync_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inspection_suggestions', db_index=False)
     
     # Sync-related fields
     mobile_id = models.IntegerField(unique=True, null=True, blank=True)
+    # Bumped by every write, for optimistic concurrency on delta syncs
+    version = models.PositiveIntegerField(default=1)
     last_synced = models.DateTimeField(null=True, blank=True)
     sync_status = models.CharField(
         max_length=20,
@@ -36,11 +39,18 @@ class InspectionSuggestion(models.Model):
     )
     
     class Meta:
+        # property_location is indexed as a ForeignKey and mobile_id through
+        # unique=True. See query_plans.py for the queries these indexes are
+        # checked against.
         indexes = [
-            models.Index(fields=['property_location']),
-            models.Index(fields=['user']),
-            models.Index(fields=['mobile_id']),
-            models.Index(fields=['sync_status']),
+            # pending_sync keyset scan, and user lookups through its prefix
+            models.Index(fields=['user', 'updated_at', 'id'], name='insp_sugg_user_sync_idx'),
+            # Only the few rows still waiting to sync
+            models.Index(
+                fields=['user'],
+                name='insp_sugg_pending_idx',
+                condition=models.Q(sync_status='pending')
+            ),
         ]
     
     def __str__(self):
@@ -57,7 +67,7 @@ class InspectionSuggestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = InspectionSuggestion
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at', 'last_synced', 'sync_status', 'user')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'last_synced', 'sync_status', 'user', 'version')
 
 
 class InspectionSuggestionBulkSyncSerializer(serializers.Serializer):
@@ -71,14 +81,30 @@ class InspectionSuggestionBulkSyncSerializer(serializers.Serializer):
 
 
 # Views
+from collections import Counter
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils import timezone
+from django.apps import apps
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .bulk_sync import VersionConflict, bulk_write, changed_fields, coerce_id, field_values, get_batch_size, in_bulk_by
+from .sync_changelog import CREATE, DELETE, UPDATE, change_logger, log_changes
+from .sync_cache import INSPECTION_SUGGESTIONS, OBSERVATION_POINTS, get_cached_response, invalidate_pending_sync, store_response
+from .sync_backpressure import admit_upload, backpressure
+from .sync_idempotency import idempotent
+from .sync_pagination import KEYSET_COLUMNS, CursorExpired, SyncCursorPagination
+from .sync_tombstones import INSPECTION_SUGGESTION, OBSERVATION_POINT, Tombstone, record_tombstones
+from .sync_streaming import NDJSONStreamMixin
+from .fast_serializers import values_serializer_for
+from .observation_layout import generate_layout, parse_confidence, sample_size
+from .farm_summary import apply_deltas, rebuild_farm_summary
 
-class InspectionSuggestionViewSet(viewsets.ModelViewSet):
+class InspectionSuggestionViewSet(NDJSONStreamMixin, viewsets.ModelViewSet):
     """
     ViewSet for InspectionSuggestion model.
     """
@@ -89,7 +115,11 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
         """
         Return inspection suggestions for the authenticated user.
         """
-        return InspectionSuggestion.objects.filter(user=self.request.user)
+        queryset = InspectionSuggestion.objects.filter(user=self.request.user)
+        if self.action in ('update', 'partial_update'):
+            # Held until update() commits, so concurrent updates bump the version in turn
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
     
     def perform_create(self, serializer):
         """
@@ -97,14 +127,43 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
     
-    @action(detail=False, methods=['post'])
     @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        """
+        Update the row under a lock taken by get_queryset.
+        """
+        return super().update(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        """
+        Bump the version so pending deltas based on the old one conflict.
+        
+        The row is locked, so the version read here is the latest one.
+        """
+        serializer.save(version=serializer.instance.version + 1)
+    
+    @action(detail=False, methods=['post'])
+    @admit_upload()
+    @idempotent('inspection-suggestions-sync')
+    @backpressure('inspection_suggestions')
     def sync(self, request):
         """
         Sync inspection suggestions from the mobile app.
         
         This endpoint handles bulk creation, update, and deletion of inspection suggestions.
         It expects a list of inspection suggestions with mobile_id to identify them.
+        
+        Suggestions are upserted in bulk and observation point propagation is
+        deferred until the batch is written, so each affected farm gets a single
+        UPDATE using the last suggestion synced for it. Writes are committed every
+        SYNC_COMMIT_CHUNK_SIZE rows and a failing row is isolated in a savepoint.
+        A retry carrying the same Idempotency-Key replays the stored response.
+        
+        Updates may be sent as deltas: only the changed fields plus the
+        `base_version` they were edited from. A row whose version has moved on
+        comes back as a conflict with its server_version, rows whose values
+        are unchanged are not written at all, and only the changed columns of
+        the rest are written, each bumping the row's version.
         """
         serializer = InspectionSuggestionBulkSyncSerializer(data=request.data)
         if not serializer.is_valid():
@@ -115,9 +174,30 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
         # Track results
         created_count = 0
         updated_count = 0
+        unchanged_count = 0
+        conflict_count = 0
         failed_count = 0
         results = []
         
+        # Resolve farms and existing suggestions for the whole batch
+        farms = in_bulk_by(
+            Farm.objects.filter(user=request.user),
+            'id',
+            [coerce_id(suggestion_data.get('property_location')) for suggestion_data in suggestions_data]
+        )
+        suggestions_by_mobile_id = in_bulk_by(
+            InspectionSuggestion.objects.all(),
+            'mobile_id',
+            [coerce_id(suggestion_data.get('id')) for suggestion_data in suggestions_data]
+        )
+        
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        update_fields = {'last_synced', 'sync_status'}
+        updated_pks = set()
+        staged = []
+        
         for suggestion_data in suggestions_data:
             try:
                 # Extract mobile_id and farm_id
@@ -125,62 +205,73 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
                 farm_id = suggestion_data.get('property_location')
                 
                 # Verify farm belongs to user
-                farm = Farm.objects.filter(id=farm_id, user=request.user).first()
+                farm = farms.get(coerce_id(farm_id))
                 if not farm:
                     results.append({
                         'mobile_id': mobile_id,
                         'status': 'failed',
                         'message': f'Farm with ID {farm_id} not found or does not belong to user'
                     })
-                    failed_count += 1
                     continue
                 
-                # Check if suggestion exists
-                suggestion = InspectionSuggestion.objects.filter(mobile_id=mobile_id).first()
+                # Check if suggestion exists, including ones staged earlier in this batch
+                suggestion = suggestions_by_mobile_id.get(coerce_id(mobile_id))
                 
                 if suggestion:
-                    # Update existing suggestion
+                    # A delta names the version it was edited from; refuse it if the row moved on
+                    base_version = suggestion_data.get('base_version')
+                    if (suggestion.pk is not None and base_version is not None
+                            and coerce_id(base_version) != suggestion.version):
+                        results.append(self._conflict_result(mobile_id, suggestion.pk, suggestion.version))
+                        continue
+                    
+                    # Update existing suggestion with the fields sent
+                    before = field_values(suggestion)
                     for key, value in suggestion_data.items():
-                        if key not in ['id', 'mobile_id', 'user']:
+                        if key not in ['id', 'mobile_id', 'user', 'base_version']:
                             if key == 'property_location':
                                 # Handle foreign key
                                 suggestion.property_location = farm
                             else:
                                 setattr(suggestion, key, value)
+                    suggestion.clean_fields(exclude=['property_location', 'user'])
                     
-                    suggestion.last_synced = timezone.now()
-                    suggestion.sync_status = 'synced'
-                    suggestion.save()
-                    
-                    # Update related observation points
-                    self._update_observation_points(suggestion)
-                    
-                    results.append({
-                        'mobile_id': mobile_id,
-                        'server_id': suggestion.id,
-                        'status': 'updated'
-                    })
-                    updated_count += 1
+                    # Only the columns that actually changed are written; unchanged rows not at all
+                    changed = changed_fields(suggestion, before)
+                    if changed:
+                        update_fields.update(changed)
+                        suggestion.last_synced = now
+                        suggestion.sync_status = 'synced'
+                        if suggestion.pk is not None and suggestion.pk not in updated_pks:
+                            updated_pks.add(suggestion.pk)
+                            to_update.append(suggestion)
+                        row_status = 'updated'
+                    else:
+                        row_status = 'unchanged'
                 else:
                     # Create new suggestion
-                    new_suggestion_data = {k: v for k, v in suggestion_data.items() if k not in ['id', 'property_location', 'user']}
+                    new_suggestion_data = {k: v for k, v in suggestion_data.items() if k not in ['id', 'property_location', 'user', 'base_version']}
                     new_suggestion_data['property_location'] = farm
                     new_suggestion_data['user'] = request.user
                     new_suggestion_data['mobile_id'] = mobile_id
-                    new_suggestion_data['last_synced'] = timezone.now()
+                    new_suggestion_data['last_synced'] = now
                     new_suggestion_data['sync_status'] = 'synced'
                     
-                    suggestion = InspectionSuggestion.objects.create(**new_suggestion_data)
+                    suggestion = InspectionSuggestion(**new_suggestion_data)
+                    suggestion.clean_fields(exclude=['property_location', 'user'])
                     
-                    # Update related observation points
-                    self._update_observation_points(suggestion)
-                    
-                    results.append({
-                        'mobile_id': mobile_id,
-                        'server_id': suggestion.id,
-                        'status': 'created'
-                    })
-                    created_count += 1
+                    to_create.append(suggestion)
+                    if suggestion.mobile_id is not None:
+                        suggestions_by_mobile_id[suggestion.mobile_id] = suggestion
+                    row_status = 'created'
+                
+                result = {
+                    'mobile_id': mobile_id,
+                    'server_id': None,
+                    'status': row_status
+                }
+                results.append(result)
+                staged.append((result, suggestion))
             
             except Exception as e:
                 results.append({
@@ -188,38 +279,245 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
                     'status': 'failed',
                     'message': str(e)
                 })
+        
+        # Write the whole batch with bulk_create/bulk_update
+        errors = bulk_write(
+            InspectionSuggestion, to_create, to_update, update_fields,
+            on_write=change_logger(request.user.pk, INSPECTION_SUGGESTION),
+            version_field='version'
+        )
+        
+        # Bulk writes bypass the post_save signal, so drop cached pulls here
+        if to_create or to_update:
+            invalidate_pending_sync(request.user.pk, INSPECTION_SUGGESTIONS)
+        
+        # The last suggestion written for each farm is the one its points end up with
+        final_suggestions = {}
+        for result, suggestion in staged:
+            error = errors.get(id(suggestion))
+            if error is None:
+                result['server_id'] = suggestion.id
+                result['version'] = suggestion.version
+                if result['status'] != 'unchanged':
+                    final_suggestions.pop(suggestion.property_location_id, None)
+                    final_suggestions[suggestion.property_location_id] = suggestion
+            elif isinstance(error, VersionConflict):
+                result.update(self._conflict_result(result['mobile_id'], suggestion.pk, error.server_version))
+            else:
+                del result['server_id']
+                result['status'] = 'failed'
+                result['message'] = error
+        
+        # Update related observation points once per affected farm
+        for suggestion in final_suggestions.values():
+            self._update_observation_points(suggestion)
+        
+        for result in results:
+            if result['status'] == 'created':
+                created_count += 1
+            elif result['status'] == 'updated':
+                updated_count += 1
+            elif result['status'] == 'unchanged':
+                unchanged_count += 1
+            elif result['status'] == 'conflict':
+                conflict_count += 1
+            else:
                 failed_count += 1
         
         return Response({
             'status': 'success',
             'created': created_count,
             'updated': updated_count,
+            'unchanged': unchanged_count,
+            'conflicts': conflict_count,
             'failed': failed_count,
             'results': results
         })
     
+    def _conflict_result(self, mobile_id, server_id, server_version):
+        return {
+            'mobile_id': mobile_id,
+            'server_id': server_id,
+            'status': 'conflict',
+            'server_version': server_version,
+            'message': 'Changed on the server since base_version; pull it and resend the delta'
+        }
+    
     def _update_observation_points(self, suggestion):
         """
         Update observation points related to this suggestion.
         
         When a suggestion is created or updated, we need to update the related
         observation points with the suggestion's target_entity and confidence_level.
+        Points that already match are left alone, keeping their version and
+        updated_at. sync calls this once per farm, after the whole batch has
+        been written.
         """
         from .observation_points_sync import ObservationPoint
         
-        # Get all observation points for this farm
+        # Get the observation points of this farm that do not carry the suggestion's data yet;
+        # rewriting the others would only make every device pull them again
         observation_points = ObservationPoint.objects.filter(
             farm=suggestion.property_location
+        ).filter(
+            ~Q(inspection_suggestion=suggestion)
+            | ~Q(target_entity=suggestion.target_entity)
+            | ~Q(confidence_level=suggestion.confidence_level)
+        )
+        
+        # Update them with the suggestion's data, logging the change and moving the
+        # farm's summary counts in the same transaction
+        now = timezone.now()
+        with transaction.atomic():
+            # Points are locked before the summary rows, as every point writer does
+            changed = list(
+                observation_points.select_for_update().order_by('pk')
+                .values_list('id', 'mobile_id', 'observation_status', 'target_entity', 'confidence_level')
+            )
+            if not changed:
+                return
+            farm_id = suggestion.property_location_id
+            deltas = Counter()
+            for _, _, observation_status, target_entity, confidence_level in changed:
+                deltas[(farm_id, observation_status, target_entity or '', confidence_level or '')] -= 1
+                deltas[(
+                    farm_id, observation_status, suggestion.target_entity or '', suggestion.confidence_level or ''
+                )] += 1
+            apply_deltas(deltas)
+            ObservationPoint.objects.filter(pk__in=[row[0] for row in changed]).update(
+                inspection_suggestion=suggestion,
+                target_entity=suggestion.target_entity,
+                confidence_level=suggestion.confidence_level,
+                last_synced=now,
+                updated_at=now,
+                version=F('version') + 1,
+                sync_status='synced'
+            )
+            log_changes(
+                suggestion.property_location.user_id,
+                OBSERVATION_POINT,
+                [(pk, mobile_id) for pk, mobile_id, *_ in changed],
+                UPDATE
+            )
+        
+        # QuerySet.update() bypasses signals, so drop the owner's cached point pulls
+        invalidate_pending_sync(suggestion.property_location.user_id, OBSERVATION_POINTS)
+    
+    @action(detail=True, methods=['post'])
+    @idempotent('inspection-suggestion-layout')
+    def generate_layout(self, request, pk=None):
+        """
+        Generate the observation points of the suggestion's farm on the server.
+        
+        The number of points is the sample size that detects the target at
+        LAYOUT_DESIGN_PREVALENCE with the suggestion's confidence_level, given
+        its area_size (hectares) and density_of_plant (plants per m²), capped
+        at LAYOUT_MAX_POINTS. Points are spaced evenly inside the farm's
+        boundary, split into `segments` (default 6) vertical slices as the
+        mobile app does, and written with one bulk insert.
+        
+        A farm that already has observation points gets 409 unless `replace`
+        is true, in which case its points are deleted first with one bulk
+        delete. The response lists the new points in segment order.
+        """
+        from .observation_points_sync import ObservationPoint, ObservationPointSerializer
+        
+        suggestion = self.get_object()
+        farm = suggestion.property_location
+        
+        try:
+            segments = int(request.data.get('segments', 6))
+        except (TypeError, ValueError):
+            segments = 0
+        if segments < 1:
+            return Response(
+                {'error': 'segments must be a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        replace = request.data.get('replace') in (True, 'true', '1')
+        
+        boundary = list(
+            apps.get_model('api', 'BoundaryPoint').objects
+            .filter(farm=farm).order_by('id').values_list('latitude', 'longitude')
         )
+        if len(boundary) < 3:
+            return Response(
+                {'error': 'Not enough boundary points to generate observation points. Add at least 3 to the farm'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Update them with the suggestion's data
-        observation_points.update(
-            inspection_suggestion=suggestion,
-            target_entity=suggestion.target_entity,
-            confidence_level=suggestion.confidence_level,
-            last_synced=timezone.now(),
-            sync_status='synced'
+        points = sample_size(
+            suggestion.area_size,
+            suggestion.density_of_plant,
+            parse_confidence(suggestion.confidence_level),
+            getattr(settings, 'LAYOUT_DESIGN_PREVALENCE', 0.01)
         )
+        try:
+            latitudes, longitudes, segment_numbers, spacing = generate_layout(
+                boundary, points, segments, max_points=getattr(settings, 'LAYOUT_MAX_POINTS', 20000)
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not len(segment_numbers):
+            return Response(
+                {'error': 'The farm boundary is too narrow to place observation points'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        observation_points = []
+        numbered = {}
+        for latitude, longitude, segment in zip(latitudes.tolist(), longitudes.tolist(), segment_numbers.tolist()):
+            numbered[segment] = numbered.get(segment, 0) + 1
+            observation_points.append(ObservationPoint(
+                farm=farm,
+                latitude=latitude,
+                longitude=longitude,
+                segment=segment,
+                name=f'Section {segment} Point {numbered[segment]}',
+                inspection_suggestion=suggestion,
+                confidence_level=suggestion.confidence_level,
+                target_entity=suggestion.target_entity
+            ))
+        
+        with transaction.atomic():
+            # Serializes concurrent layouts of the same farm
+            Farm.objects.select_for_update().get(pk=farm.pk)
+            existing = ObservationPoint.objects.filter(farm=farm)
+            replaced = list(existing.values_list('id', 'mobile_id'))
+            if replaced:
+                if not replace:
+                    return Response(
+                        {'error': 'The farm already has observation points. Send replace=true to regenerate them'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                # A queryset delete leaves the tombstones, change log entries and
+                # summary counts to us, so the receivers do no per-row work
+                record_tombstones([
+                    Tombstone(entity=OBSERVATION_POINT, user_id=farm.user_id, object_id=pk, mobile_id=mobile_id)
+                    for pk, mobile_id in replaced
+                ])
+                log_changes(farm.user_id, OBSERVATION_POINT, replaced, DELETE)
+                existing.delete()
+            ObservationPoint.objects.bulk_create(observation_points, batch_size=get_batch_size())
+            # bulk_create bypasses post_save, so log the new rows and recount the farm here
+            log_changes(farm.user_id, OBSERVATION_POINT, [(point.pk, None) for point in observation_points], CREATE)
+            rebuild_farm_summary(farm.pk)
+        
+        invalidate_pending_sync(farm.user_id, OBSERVATION_POINTS)
+        
+        created = ObservationPoint.objects.filter(farm=farm).order_by('id')
+        values_serializer = values_serializer_for(ObservationPointSerializer, context=self.get_serializer_context())
+        if values_serializer is not None:
+            results = values_serializer.serialize(values_serializer.rows(created))
+        else:
+            results = ObservationPointSerializer(created, many=True, context=self.get_serializer_context()).data
+        return Response({
+            'status': 'success',
+            'created': len(observation_points),
+            'segments': int(segment_numbers.max()),
+            'spacing': round(spacing, 2),
+            'results': results
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=False, methods=['get'])
     def pending_sync(self, request):
@@ -227,8 +525,29 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
         Get inspection suggestions that need to be synced to the mobile app.
         
         This endpoint returns inspection suggestions that have been updated on the server
-        since the last sync.
+        since the last sync, one page at a time ordered by (updated_at, id).
+        Pass the returned next_cursor as ?cursor= to fetch the following page
+        or to resume after a dropped connection.
+        
+        Each page also lists the inspection suggestions deleted since the cursor under
+        `deleted`. Cursors older than SYNC_TOMBSTONE_RETENTION get 410 Gone
+        and must resync from scratch.
+        
+        With `Accept: application/x-ndjson` every remaining row is streamed one
+        per line instead, followed by one `{"deleted": ...}` line per deletion,
+        and the final line carries next_cursor.
+        
+        Non-streamed pages are cached per user until the user's data changes.
+        Rows are read as value tuples and rendered by a ValuesSerializer, which
+        produces the same JSON as serializer_class without building instances;
+        serializers it cannot compile are used as they are.
         """
+        # Serve repeated polls from the per-user cache
+        if not self.wants_stream(request):
+            cached = get_cached_response(request, INSPECTION_SUGGESTIONS)
+            if cached is not None:
+                return cached
+        
         last_sync = request.query_params.get('last_sync')
         
         if last_sync:
@@ -242,10 +561,47 @@ class InspectionSuggestionViewSet(viewsets.ModelViewSet):
                 )
         else:
             # If no last_sync provided, return all inspection suggestions
+            last_sync_time = None
             queryset = self.get_queryset()
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = SyncCursorPagination(
+            tombstones=Tombstone.objects.filter(user=request.user, entity=INSPECTION_SUGGESTION),
+            deleted_since=last_sync_time
+        )
+        try:
+            if self.wants_stream(request):
+                # Stream every remaining row, then the deletions; the last line carries next_cursor
+                return self.stream_response(
+                    paginator.order_after_cursor(queryset, request),
+                    trailer=paginator.get_stream_trailer,
+                    tail=paginator.iter_deleted()
+                )
+            # Flat serializers render straight from value rows
+            values_serializer = values_serializer_for(
+                self.get_serializer_class(), context=self.get_serializer_context()
+            )
+            if values_serializer is not None:
+                page = paginator.paginate_queryset(
+                    values_serializer.rows(queryset, extra=KEYSET_COLUMNS), request, view=self
+                )
+            else:
+                page = paginator.paginate_queryset(queryset, request, view=self)
+        except CursorExpired:
+            return Response(
+                {'error': 'Deletions since this sync have been compacted. Resync without a cursor or last_sync'},
+                status=status.HTTP_410_GONE
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor. Use the next_cursor value from a previous response'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if values_serializer is not None:
+            data = values_serializer.serialize(page)
+        else:
+            data = self.get_serializer(page, many=True).data
+        return store_response(request, INSPECTION_SUGGESTIONS, paginator.get_paginated_response(data))
 
 
 # URLs
@@ -47,6 +47,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Counts and times every SQL query; outermost so totals cover the whole stack
+    'api.sync_metrics.QueryMetricsMiddleware',
+    # Decides per request whether reads may go to a replica
+    'api.db_routing.ReplicaRoutingMiddleware',
+    # Compression runs outermost so it sees the final response body
+    'api.sync_middleware.SyncGZipMiddleware',
+    'api.sync_middleware.GzipRequestMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +95,24 @@ DATABASES = {
     }
 }
 
+# Read replicas for the reads of safe requests, one alias per host in
+# DB_REPLICA_HOSTS. Without it a single alias points at the primary, which
+# exercises the routing locally; tests mirror it onto the primary.
+for index, host in enumerate(
+    [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host] or [DATABASES['default']['HOST']],
+    start=1
+):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.db_routing.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias.startswith('replica_')]
+REPLICA_STICKY_SECONDS = 5  # Seconds a caller reads from the primary after writing
+REPLICA_STICKY_CACHE_ALIAS = 'replica-pins'  # Shared between worker processes; a LocMem alias is refused
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -124,7 +149,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.cached_token_auth.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -138,6 +163,86 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Caches
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # pending_sync pages and their generation tokens. Shared between worker
+    # processes through Redis, so invalidation reaches all of them; run Redis
+    # with an LRU maxmemory policy to bound it (an evicted generation only
+    # makes its pages unreachable).
+    'sync': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        'KEY_PREFIX': 'pending-sync',
+        'TIMEOUT': 300,
+    },
+    # Resolved API tokens. Revocation only reaches the processes sharing this
+    # cache, so it is shared between worker processes through Redis; Redis's
+    # maxmemory policy bounds it instead of MAX_ENTRIES.
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        'KEY_PREFIX': 'auth-tokens',
+        'TIMEOUT': 300,
+    },
+    # Read-your-writes pins of db_routing.py. A sync POST handled by one
+    # worker must pin the device's next GET on any other, so this is shared.
+    'replica-pins': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        'KEY_PREFIX': 'replica-pins',
+    },
+}
+
+# Authentication settings
+AUTH_TOKEN_CACHE_ALIAS = 'auth'  # Cache alias holding resolved API tokens
+AUTH_TOKEN_CACHE_TTL = 300  # Seconds a resolved token is trusted without a query
+
+# Sync settings
+SYNC_BULK_BATCH_SIZE = 500  # Rows per bulk INSERT/UPDATE statement
+SYNC_COMMIT_CHUNK_SIZE = 1000  # Rows committed per transaction by the sync endpoints
+SYNC_PAGE_SIZE = 500  # Default pending_sync page size
+SYNC_MAX_PAGE_SIZE = 2000  # Upper bound for ?page_size=
+SYNC_STREAM_CHUNK_SIZE = 2000  # Rows fetched per round trip when streaming NDJSON
+SYNC_JOB_WORKERS = 2  # Default process count for run_sync_worker
+SYNC_JOB_TIMEOUT = 600  # Seconds without a heartbeat before a running job is considered abandoned
+SYNC_JOB_HEARTBEAT_INTERVAL = 30  # Seconds between a running job's heartbeats
+SYNC_JOB_MAX_ATTEMPTS = 3  # Attempts before an abandoned job is marked failed
+SYNC_MAX_DECOMPRESSED_BODY = 50 * 1024 * 1024  # Cap on inflated gzip request bodies
+SYNC_GZIP_MIN_LENGTH = 1024  # Responses smaller than this are sent uncompressed
+SYNC_IDEMPOTENCY_TTL = 24 * 60 * 60  # Seconds a stored Idempotency-Key response is replayed
+SYNC_IDEMPOTENCY_WAIT = 30  # Seconds a duplicate waits for the first request to finish
+SYNC_IDEMPOTENCY_LOCK_TIMEOUT = 600  # Seconds before an unfinished claim can be taken over
+SYNC_CACHE_ALIAS = 'sync'  # Cache alias holding pending_sync pages
+SYNC_CACHE_TTL = 300  # Seconds a cached pending_sync page may be served
+SYNC_QUERY_BUDGET = 50  # Requests running more SQL queries than this are logged
+SYNC_TARGET_BATCH_SECONDS = 2.0  # Upload duration the advertised batch size aims for
+SYNC_MIN_BATCH_SIZE = 50  # Bounds of the advertised batch size, in rows
+SYNC_MAX_BATCH_SIZE = 5000
+SYNC_MAX_CONCURRENT_UPLOADS = 8  # Uploads processed at once across the deployment; more get 429
+SYNC_UPLOAD_SLOT_CACHE_ALIAS = 'sync'  # Shared cache holding the upload slots; a LocMem alias is refused
+SYNC_UPLOAD_SLOT_LEASE = 600  # Seconds before the slot of an upload whose process died is freed
+SYNC_TOMBSTONE_RETENTION = 90 * 24 * 60 * 60  # Seconds deletions are kept for incremental pulls
+SYNC_TOMBSTONE_COMPACT_INTERVAL = 60 * 60  # Seconds between tombstone compactions per worker
+
+# Observation point layout settings
+LAYOUT_DESIGN_PREVALENCE = 0.01  # Infested share of plants a generated layout must detect
+LAYOUT_MAX_POINTS = 20000  # Upper bound on points generated per farm
+
+# Farm summary settings
+FARM_SUMMARY_RECONCILE_INTERVAL = 6 * 60 * 60  # Seconds between summary recounts per worker
+
+# Profile picture settings
+PROFILE_PICTURE_MAX_SIZE = 10 * 1024 * 1024  # Largest accepted upload, in bytes
+PROFILE_PICTURE_CHUNK_SIZE = 512 * 1024  # Largest chunk accepted per PATCH
+PROFILE_PICTURE_UPLOAD_TTL = 24 * 60 * 60  # Seconds before an unfinished upload is discarded
+PROFILE_PICTURE_WORKERS = 2  # Processes rendering thumbnail and medium variants
+
+# Metrics settings
+METRICS_ALLOWED_IPS = ['127.0.0.1']  # Clients allowed to scrape /metrics/
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -158,9 +263,12 @@ CORS_ALLOW_HEADERS = [
     "accept",
     "accept-encoding",
     "authorization",
+    "content-encoding",
     "content-type",
     "dnt",
+    "idempotency-key",
     "origin",
+    "upload-offset",
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
@@ -217,12 +325,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.documentation import include_docs_urls
+from api.sync_metrics import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('api/auth/', include('authentication.urls')),
     path('docs/', include_docs_urls(title='HarvestGuard API')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 # Serve media files in development
@@ -242,7 +352,12 @@ from .views import (
     ObservationPointViewSet,
     InspectionSuggestionViewSet,
     UserProfileViewSet,
+    ProfilePictureUploadViewSet,
+    SyncJobViewSet,
     sync_data,
+    pull_changes,
+    farm_summaries,
+    pending_sync_cache_stats,
 )
 
 router = DefaultRouter()
@@ -251,10 +366,15 @@ router.register(r'boundary-points', BoundaryPointViewSet, basename='boundary-poi
 router.register(r'observation-points', ObservationPointViewSet, basename='observation-point')
 router.register(r'inspection-suggestions', InspectionSuggestionViewSet, basename='inspection-suggestion')
 router.register(r'profile', UserProfileViewSet, basename='profile')
+router.register(r'profile-picture-uploads', ProfilePictureUploadViewSet, basename='profile-picture-upload')
+router.register(r'sync-jobs', SyncJobViewSet, basename='sync-job')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('sync/', sync_data, name='sync-data'),
+    path('changes/', pull_changes, name='pull-changes'),
+    path('farm-summaries/', farm_summaries, name='farm-summaries'),
+    path('sync-cache-stats/', pending_sync_cache_stats, name='sync-cache-stats'),
 ]
 
 # Authentication URLs
@@ -276,21 +396,166 @@ urlpatterns = [
 Main sync view for bulk synchronization.
 """
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework import status
-from django.db import transaction
+from django.urls import reverse
 from django.utils import timezone
+from .sync_idempotency import idempotent
+from .sync_msgpack import MessagePackParser
+from .sync_backpressure import admit_upload, backpressure
+from .sync_jobs import SyncJobSerializer, enqueue_sync_job, wants_async
+from .sync_pagination import KEYSET_COLUMNS, CursorExpired, SyncCursorPagination
+from .fast_serializers import values_serializer_for
+from .sync_tombstones import FARM, INSPECTION_SUGGESTION, OBSERVATION_POINT, Tombstone, serialize_tombstone
+from .user_profile_sync import etag_matches, profile_etag
+
+def run_sync(request, on_progress=None):
+    """
+    Sync every entity list present in request.data and return the combined results.
+    
+    on_progress, if given, is called with the entity key and its row count
+    after each entity has been processed. Used by sync_data and by the sync
+    job workers.
+    """
+    # Initialize response data
+    response_data = {
+        'status': 'success',
+        'timestamp': timezone.now().isoformat(),
+        'results': {}
+    }
+    
+    def report(key):
+        if on_progress is not None:
+            on_progress(key, len(request.data[key]))
+    
+    # Process farms
+    if 'farms' in request.data:
+        from .views import FarmViewSet
+        farm_viewset = FarmViewSet()
+        farm_viewset.request = request
+        farm_result = farm_viewset.sync(request)
+        response_data['results']['farms'] = farm_result.data
+        report('farms')
+    
+    # Process boundary points
+    if 'boundary_points' in request.data:
+        from .views import BoundaryPointViewSet
+        boundary_viewset = BoundaryPointViewSet()
+        boundary_viewset.request = request
+        boundary_result = boundary_viewset.sync(request)
+        response_data['results']['boundary_points'] = boundary_result.data
+        report('boundary_points')
+    
+    # Process observation points
+    if 'observation_points' in request.data:
+        from .views import ObservationPointViewSet
+        observation_viewset = ObservationPointViewSet()
+        observation_viewset.request = request
+        observation_result = observation_viewset.sync(request)
+        response_data['results']['observation_points'] = observation_result.data
+        report('observation_points')
+    
+    # Process inspection suggestions
+    if 'inspection_suggestions' in request.data:
+        from .views import InspectionSuggestionViewSet
+        suggestion_viewset = InspectionSuggestionViewSet()
+        suggestion_viewset.request = request
+        suggestion_result = suggestion_viewset.sync(request)
+        response_data['results']['inspection_suggestions'] = suggestion_result.data
+        report('inspection_suggestions')
+    
+    return response_data
 
-@api_view(['POST'])
+def run_pull(request):
+    """
+    Pull the changes of every entity type since its own cursor, in one response.
+    
+    Each entity's cursor is read from the query parameter named after it and
+    is interchangeable with the cursors its pending_sync issues; ?profile=
+    carries the profile ETag last received. page_size is a budget for the
+    whole response: entities are filled in order until it runs out, and an
+    entity left without budget keeps its incoming cursor.
+    
+    Raises ValueError for a malformed cursor and CursorExpired for one that
+    last read the tombstone log before the retention horizon.
+    """
+    from .views import FarmViewSet, ObservationPointViewSet, InspectionSuggestionViewSet, UserProfileViewSet
+    
+    response_data = {
+        'timestamp': timezone.now().isoformat(),
+        'cursors': {},
+        'has_more': False
+    }
+    budget = SyncCursorPagination().get_page_size(request)
+    
+    for key, viewset_class, entity in (
+        ('farms', FarmViewSet, FARM),
+        ('observation_points', ObservationPointViewSet, OBSERVATION_POINT),
+        ('inspection_suggestions', InspectionSuggestionViewSet, INSPECTION_SUGGESTION),
+    ):
+        if budget <= 0:
+            response_data['cursors'][key] = request.query_params.get(key)
+            response_data['has_more'] = True
+            continue
+        
+        viewset = viewset_class(request=request, format_kwarg=None)
+        paginator = SyncCursorPagination(
+            tombstones=Tombstone.objects.filter(user=request.user, entity=entity),
+            page_size=budget,
+            cursor_query_param=key,
+            share_page_size=True
+        )
+        # Flat serializers render straight from value rows
+        values_serializer = values_serializer_for(
+            viewset.get_serializer_class(), context=viewset.get_serializer_context()
+        )
+        if values_serializer is not None:
+            page = paginator.paginate_queryset(
+                values_serializer.rows(viewset.get_queryset(), extra=KEYSET_COLUMNS), request
+            )
+            results = values_serializer.serialize(page)
+        else:
+            page = paginator.paginate_queryset(viewset.get_queryset(), request)
+            results = viewset.get_serializer(page, many=True).data
+        budget -= len(page) + len(paginator.deleted)
+        
+        response_data[key] = {
+            'results': results,
+            'deleted': [serialize_tombstone(tombstone) for tombstone in paginator.deleted]
+        }
+        response_data['cursors'][key] = paginator.get_next_cursor()
+        response_data['has_more'] = response_data['has_more'] or paginator.has_more
+    
+    # The profile is a single row; its ETag serves as its cursor
+    profile_viewset = UserProfileViewSet(request=request, format_kwarg=None)
+    profile_data = profile_viewset.get_serializer(profile_viewset.get_object()).data
+    etag = profile_etag(profile_data)
+    response_data['profile'] = None if etag_matches(etag, request.query_params.get('profile')) else profile_data
+    response_data['cursors']['profile'] = etag
+    
+    return response_data
+
+@api_view(['GET', 'POST'])
+@parser_classes([*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser])
 @permission_classes([IsAuthenticated])
-@transaction.atomic
+@admit_upload(exempt_async=True)
+@idempotent('sync-data')
+@backpressure('farms', 'boundary_points', 'observation_points', 'inspection_suggestions')
 def sync_data(request):
     """
     Endpoint for bulk syncing data from the mobile app.
     
-    This endpoint handles syncing of all data types in a single request.
+    GET pulls every entity type in one round trip instead of one pending_sync
+    call each. Send each entity's cursor from the previous response's
+    `cursors` as a query parameter of the same name (?farms=...,
+    ?observation_points=..., ?inspection_suggestions=..., ?profile=<etag>)
+    and repeat while has_more is true. The response carries `results` and
+    `deleted` per entity, and `profile` is null when unchanged.
+    
+    POST handles syncing of all data types in a single request.
     It expects a JSON object with the following structure:
     
     {
@@ -300,49 +565,49 @@ def sync_data(request):
         "inspection_suggestions": [...]
     }
     
-    Each list contains objects with the data to sync.
+    Each list contains objects with the data to sync. The body may also be
+    MessagePack (application/x-msgpack) with each list sent as column arrays.
+    
+    The request is not wrapped in a single transaction: each entity sync
+    commits every SYNC_COMMIT_CHUNK_SIZE rows and isolates failing rows in
+    savepoints, so one bad row costs one row and locks are held briefly.
+    
+    Retries that repeat an Idempotency-Key header get the stored response of
+    the first request replayed instead of being processed again.
+    
+    Uploads are capped at the advertised X-Sync-Batch-Size rows in total:
+    the lists are accepted in the order above up to that budget, and
+    `resume_from` maps each list cut short to the index to resend from.
+    When the server is saturated it answers 429 with Retry-After.
+    
+    With ?async=1 the payload is queued as a SyncJob and a 202 with the job
+    is returned immediately; poll /api/sync-jobs/<id>/ for progress and the
+    result. Jobs are processed by `python manage.py run_sync_worker`.
     """
+    if request.method == 'GET':
+        try:
+            return Response(run_pull(request))
+        except CursorExpired:
+            return Response(
+                {'error': 'Deletions since these cursors have been compacted. Resync without cursors'},
+                status=status.HTTP_410_GONE
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor. Use the cursors value from a previous response'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    if wants_async(request):
+        job = enqueue_sync_job(request.user, request.data)
+        return Response(
+            SyncJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('sync-job-detail', args=[job.id])}
+        )
+    
     try:
-        # Initialize response data
-        response_data = {
-            'status': 'success',
-            'timestamp': timezone.now().isoformat(),
-            'results': {}
-        }
-        
-        # Process farms
-        if 'farms' in request.data:
-            from .views import FarmViewSet
-            farm_viewset = FarmViewSet()
-            farm_viewset.request = request
-            farm_result = farm_viewset.sync(request._request)
-            response_data['results']['farms'] = farm_result.data
-        
-        # Process boundary points
-        if 'boundary_points' in request.data:
-            from .views import BoundaryPointViewSet
-            boundary_viewset = BoundaryPointViewSet()
-            boundary_viewset.request = request
-            boundary_result = boundary_viewset.sync(request._request)
-            response_data['results']['boundary_points'] = boundary_result.data
-        
-        # Process observation points
-        if 'observation_points' in request.data:
-            from .views import ObservationPointViewSet
-            observation_viewset = ObservationPointViewSet()
-            observation_viewset.request = request
-            observation_result = observation_viewset.sync(request._request)
-            response_data['results']['observation_points'] = observation_result.data
-        
-        # Process inspection suggestions
-        if 'inspection_suggestions' in request.data:
-            from .views import InspectionSuggestionViewSet
-            suggestion_viewset = InspectionSuggestionViewSet()
-            suggestion_viewset.request = request
-            suggestion_result = suggestion_viewset.sync(request._request)
-            response_data['results']['inspection_suggestions'] = suggestion_result.data
-        
-        return Response(response_data)
+        return Response(run_sync(request))
     
     except Exception as e:
         return Response({
@@ -0,0 +1,138 @@
+"""
+Django API Design for Observation Point Layouts
+
+This file outlines the grid generation behind
+`POST /api/inspection-suggestions/{id}/generate_layout/`, which lays out a
+farm's observation points on the server instead of on the device. The
+number of points comes from the suggestion (see sample_size); the points
+are spaced evenly inside the farm's boundary and split into vertical
+segments the way the mobile app slices farms. Grid construction,
+point-in-polygon tests and segment assignment are vectorized with NumPy,
+so even large farms are laid out in milliseconds. Like image_variants.py it
+imports nothing from Django. Requires the `numpy` package.
+"""
+
+import math
+
+import numpy as np
+
+# Metres per degree of latitude, and per degree of longitude at the equator
+METRES_PER_DEGREE_LATITUDE = 110_540.0
+METRES_PER_DEGREE_LONGITUDE = 111_320.0
+
+# Used when a suggestion's confidence_level is not a percentage
+DEFAULT_CONFIDENCE = 0.95
+
+# Candidate grid points allowed per requested point before giving up on a sliver
+GRID_SIZE_LIMIT = 20
+
+
+def parse_confidence(confidence_level, default=DEFAULT_CONFIDENCE):
+    """
+    Return a confidence level such as '95%' as a fraction, or default if it is not one.
+    """
+    try:
+        confidence = float(str(confidence_level).strip().rstrip('%')) / 100
+    except ValueError:
+        return default
+    return confidence if 0 < confidence < 1 else default
+
+
+def sample_size(area_size, density_of_plant, confidence, prevalence):
+    """
+    Return how many plants to inspect to detect a pest present at prevalence.
+
+    area_size is in hectares and density_of_plant in plants per square
+    metre. Uses the finite-population approximation
+    n = (1 - (1 - confidence) ** (1 / D)) * (N - (D - 1) / 2), where N is the
+    farm's plant count and D the plants infested at the design prevalence.
+    """
+    plants = max(1, round(area_size * 10_000 * density_of_plant))
+    infested = max(1, math.ceil(plants * prevalence))
+    size = (1 - (1 - confidence) ** (1 / infested)) * (plants - (infested - 1) / 2)
+    return max(1, min(plants, math.ceil(size)))
+
+
+def points_in_polygon(x, y, polygon_x, polygon_y):
+    """
+    Return a boolean mask of the points (x, y) that lie inside the polygon.
+
+    Even-odd ray casting: the loop runs once per edge, and each edge is
+    tested against every point at once.
+    """
+    inside = np.zeros(x.shape, dtype=bool)
+    for ax, ay, bx, by in zip(polygon_x, polygon_y, np.roll(polygon_x, -1), np.roll(polygon_y, -1)):
+        if ay == by:
+            # Horizontal edges never cross the ray
+            continue
+        spans = (ay > y) != (by > y)
+        # Where the edge meets the horizontal ray through each point
+        crossing_x = ax + (y - ay) * (bx - ax) / (by - ay)
+        inside ^= spans & (x < crossing_x)
+    return inside
+
+
+def generate_layout(boundary, points, segments=6, max_points=20000):
+    """
+    Lay out about points observation points on an even grid inside boundary.
+
+    boundary is a sequence of (latitude, longitude) vertices in order. The
+    grid is spaced in metres on a local projection. Points are numbered by
+    which of segments equal slices of the boundary's longitude span they
+    fall in; empty slices are skipped, so segment numbers stay consecutive.
+
+    Returns (latitudes, longitudes, segment_numbers, spacing): three arrays
+    ordered by segment, then south to north, then west to east, and the grid
+    spacing in metres. The arrays are empty if the boundary is too thin to
+    hold a point. Raises ValueError if boundary is not a polygon.
+    """
+    vertices = np.asarray(boundary, dtype=float)
+    if vertices.ndim != 2 or vertices.shape[1] != 2:
+        raise ValueError('Boundary points must be (latitude, longitude) pairs')
+    if len(vertices) > 1 and np.array_equal(vertices[0], vertices[-1]):
+        vertices = vertices[:-1]
+    if len(vertices) < 3:
+        raise ValueError('At least 3 boundary points are required')
+
+    latitudes, longitudes = vertices[:, 0], vertices[:, 1]
+    south, west = latitudes.min(), longitudes.min()
+    x_scale = METRES_PER_DEGREE_LONGITUDE * math.cos(math.radians(latitudes.mean()))
+    polygon_x = (longitudes - west) * x_scale
+    polygon_y = (latitudes - south) * METRES_PER_DEGREE_LATITUDE
+
+    # Shoelace formula
+    area = 0.5 * abs(np.dot(polygon_x, np.roll(polygon_y, -1)) - np.dot(polygon_y, np.roll(polygon_x, -1)))
+    if area == 0:
+        raise ValueError('The boundary encloses no area')
+
+    width, height = polygon_x.max(), polygon_y.max()
+    grid_limit = GRID_SIZE_LIMIT * max_points
+    spacing = math.sqrt(area / max(1, min(points, max_points)))
+    # A thin diagonal boundary covers little of its bounding box, so the grid
+    # over the box is widened to stay within the limit, at the cost of points
+    spacing = max(spacing, math.sqrt(width * height / grid_limit))
+    # A boundary thinner than the spacing can fall between grid lines; tighten
+    # until it does not, while the tighter grid stays within the limit
+    while True:
+        grid_x, grid_y = np.meshgrid(
+            np.arange(spacing / 2, width, spacing),
+            np.arange(spacing / 2, height, spacing)
+        )
+        grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+        inside = points_in_polygon(grid_x, grid_y, polygon_x, polygon_y)
+        if inside.any() or math.ceil(2 * width / spacing) * math.ceil(2 * height / spacing) > grid_limit:
+            break
+        spacing /= 2
+    grid_x, grid_y = grid_x[inside], grid_y[inside]
+
+    slices = np.minimum((grid_x // (width / segments)).astype(int), segments - 1)
+    _, segment_numbers = np.unique(slices, return_inverse=True)
+    segment_numbers = segment_numbers.ravel() + 1
+
+    order = np.lexsort((grid_x, grid_y, segment_numbers))
+    return (
+        np.round(south + grid_y[order] / METRES_PER_DEGREE_LATITUDE, 7),
+        np.round(west + grid_x[order] / x_scale, 7),
+        segment_numbers[order],
+        spacing,
+    )
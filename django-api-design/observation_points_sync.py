@@ -13,7 +13,8 @@ class ObservationPoint(models.Model):
     """
     Model for storing observation points data.
     """
-    farm = models.ForeignKey('Farm', on_delete=models.CASCADE, related_name='observation_points')
+    # Indexed by the leading column of obs_point_farm_sync_idx
+    farm = models.ForeignKey('Farm', on_delete=models.CASCADE, related_name='observation_points', db_index=False)
     latitude = models.FloatField()
     longitude = models.FloatField()
     observation_status = models.CharField(max_length=50, default='Nil')
@@ -33,6 +34,8 @@ class ObservationPoint(models.Model):
     
     # Sync-related fields
     mobile_id = models.IntegerField(unique=True, null=True, blank=True)
+    # Bumped by every write, for optimistic concurrency on delta syncs
+    version = models.PositiveIntegerField(default=1)
     last_synced = models.DateTimeField(null=True, blank=True)
     sync_status = models.CharField(
         max_length=20,
@@ -45,10 +48,17 @@ class ObservationPoint(models.Model):
     )
     
     class Meta:
+        # mobile_id is indexed through unique=True. See query_plans.py for the
+        # queries these indexes are checked against.
         indexes = [
-            models.Index(fields=['farm']),
-            models.Index(fields=['mobile_id']),
-            models.Index(fields=['sync_status']),
+            # pending_sync keyset scan, and farm lookups through its prefix
+            models.Index(fields=['farm', 'updated_at', 'id'], name='obs_point_farm_sync_idx'),
+            # Only the few rows still waiting to sync
+            models.Index(
+                fields=['farm'],
+                name='obs_point_pending_idx',
+                condition=models.Q(sync_status='pending')
+            ),
         ]
     
     def __str__(self):
@@ -65,7 +75,7 @@ class ObservationPointSerializer(serializers.ModelSerializer):
     class Meta:
         model = ObservationPoint
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at', 'last_synced', 'sync_status')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'last_synced', 'sync_status', 'version')
 
 
 class ObservationPointBulkSyncSerializer(serializers.Serializer):
@@ -83,30 +93,79 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils import timezone
+from rest_framework.settings import api_settings
 from django.db import transaction
+from django.utils import timezone
+from .bulk_sync import VersionConflict, bulk_write, changed_fields, coerce_id, field_values, in_bulk_by
+from .sync_changelog import change_logger
+from .farm_summary import update_point_summaries
+from .sync_cache import OBSERVATION_POINTS, get_cached_response, invalidate_pending_sync, store_response
+from .sync_backpressure import admit_upload, backpressure
+from .sync_idempotency import idempotent
+from .sync_pagination import KEYSET_COLUMNS, CursorExpired, SyncCursorPagination
+from .sync_tombstones import OBSERVATION_POINT, Tombstone
+from .sync_msgpack import MessagePackParser, MessagePackRenderer, to_columns
+from .sync_streaming import NDJSONStreamMixin
+from .fast_serializers import values_serializer_for
 
-class ObservationPointViewSet(viewsets.ModelViewSet):
+class ObservationPointViewSet(NDJSONStreamMixin, viewsets.ModelViewSet):
     """
     ViewSet for ObservationPoint model.
     """
     serializer_class = ObservationPointSerializer
     permission_classes = [IsAuthenticated]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
+    renderer_classes = [*NDJSONStreamMixin.renderer_classes, MessagePackRenderer]
     
     def get_queryset(self):
         """
         Return observation points for the authenticated user.
         """
-        return ObservationPoint.objects.filter(farm__user=self.request.user)
+        queryset = ObservationPoint.objects.filter(farm__user=self.request.user)
+        if self.action in ('update', 'partial_update'):
+            # Held until update() commits, so concurrent updates bump the version in turn
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
     
-    @action(detail=False, methods=['post'])
     @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        """
+        Update the row under a lock taken by get_queryset.
+        """
+        return super().update(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        """
+        Bump the version so pending deltas based on the old one conflict.
+        
+        The row is locked, so the version read here is the latest one.
+        """
+        serializer.save(version=serializer.instance.version + 1)
+    
+    @action(detail=False, methods=['post'])
+    @admit_upload()
+    @idempotent('observation-points-sync')
+    @backpressure('observation_points')
     def sync(self, request):
         """
         Sync observation points from the mobile app.
         
         This endpoint handles bulk creation, update, and deletion of observation points.
         It expects a list of observation points with mobile_id to identify them.
+        
+        Farms, existing points and suggestions are resolved for the whole batch
+        up front and rows are written with bulk_create/bulk_update, so the query
+        count stays flat as the batch grows. Writes are committed every
+        SYNC_COMMIT_CHUNK_SIZE rows and a failing row is isolated in a savepoint.
+        A retry carrying the same Idempotency-Key replays the stored response.
+        
+        Batches may also be sent as columnar MessagePack (application/x-msgpack).
+        
+        Updates may be sent as deltas: only the changed fields plus the
+        `base_version` they were edited from. A row whose version has moved on
+        comes back as a conflict with its server_version, rows whose values
+        are unchanged are not written at all, and only the changed columns of
+        the rest are written, each bumping the row's version.
         """
         serializer = ObservationPointBulkSyncSerializer(data=request.data)
         if not serializer.is_valid():
@@ -117,9 +176,38 @@ class ObservationPointViewSet(viewsets.ModelViewSet):
         # Track results
         created_count = 0
         updated_count = 0
+        unchanged_count = 0
+        conflict_count = 0
         failed_count = 0
         results = []
         
+        # Resolve farms, existing points and suggestions for the whole batch
+        farms = in_bulk_by(
+            Farm.objects.filter(user=request.user),
+            'id',
+            [coerce_id(point_data.get('farm_id')) for point_data in observation_points_data]
+        )
+        points_by_mobile_id = in_bulk_by(
+            ObservationPoint.objects.all(),
+            'mobile_id',
+            [coerce_id(point_data.get('id')) for point_data in observation_points_data]
+        )
+        suggestions = in_bulk_by(
+            InspectionSuggestion.objects.filter(property_location__user=request.user),
+            'id',
+            [
+                coerce_id(point_data.get('inspection_suggestion_id'))
+                for point_data in observation_points_data
+            ]
+        )
+        
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        update_fields = {'last_synced', 'sync_status'}
+        updated_pks = set()
+        staged = []
+        
         for point_data in observation_points_data:
             try:
                 # Extract mobile_id and farm_id
@@ -127,72 +215,81 @@ class ObservationPointViewSet(viewsets.ModelViewSet):
                 farm_id = point_data.get('farm_id')
                 
                 # Verify farm belongs to user
-                farm = Farm.objects.filter(id=farm_id, user=request.user).first()
+                farm = farms.get(coerce_id(farm_id))
                 if not farm:
                     results.append({
                         'mobile_id': mobile_id,
                         'status': 'failed',
                         'message': f'Farm with ID {farm_id} not found or does not belong to user'
                     })
-                    failed_count += 1
                     continue
                 
-                # Check if observation point exists
-                point = ObservationPoint.objects.filter(mobile_id=mobile_id).first()
+                # Check if observation point exists, including ones staged earlier in this batch
+                point = points_by_mobile_id.get(coerce_id(mobile_id))
                 
                 if point:
-                    # Update existing point
+                    # A delta names the version it was edited from; refuse it if the row moved on
+                    base_version = point_data.get('base_version')
+                    if point.pk is not None and base_version is not None and coerce_id(base_version) != point.version:
+                        results.append(self._conflict_result(mobile_id, point.pk, point.version))
+                        continue
+                    
+                    # Update existing point with the fields sent
+                    before = field_values(point)
                     for key, value in point_data.items():
-                        if key not in ['id', 'mobile_id']:
+                        if key not in ['id', 'mobile_id', 'base_version']:
                             if key == 'farm_id':
                                 # Handle foreign key
                                 point.farm = farm
                             elif key == 'inspection_suggestion_id':
                                 # Handle foreign key
-                                suggestion = InspectionSuggestion.objects.filter(
-                                    id=value, 
-                                    property_location__user=request.user
-                                ).first()
-                                point.inspection_suggestion = suggestion
+                                point.inspection_suggestion = suggestions.get(coerce_id(value))
                             else:
                                 setattr(point, key, value)
+                    point.clean_fields(exclude=['farm', 'inspection_suggestion'])
                     
-                    point.last_synced = timezone.now()
-                    point.sync_status = 'synced'
-                    point.save()
-                    
-                    results.append({
-                        'mobile_id': mobile_id,
-                        'server_id': point.id,
-                        'status': 'updated'
-                    })
-                    updated_count += 1
+                    # Only the columns that actually changed are written; unchanged rows not at all
+                    changed = changed_fields(point, before)
+                    if changed:
+                        update_fields.update(changed)
+                        point.last_synced = now
+                        point.sync_status = 'synced'
+                        if point.pk is not None and point.pk not in updated_pks:
+                            updated_pks.add(point.pk)
+                            to_update.append(point)
+                        row_status = 'updated'
+                    else:
+                        row_status = 'unchanged'
                 else:
                     # Create new point
-                    new_point_data = {k: v for k, v in point_data.items() if k not in ['id', 'farm_id', 'inspection_suggestion_id']}
+                    new_point_data = {k: v for k, v in point_data.items() if k not in ['id', 'farm_id', 'inspection_suggestion_id', 'base_version']}
                     new_point_data['farm'] = farm
                     new_point_data['mobile_id'] = mobile_id
                     
                     # Handle inspection suggestion if present
                     if 'inspection_suggestion_id' in point_data:
-                        suggestion = InspectionSuggestion.objects.filter(
-                            id=point_data['inspection_suggestion_id'], 
-                            property_location__user=request.user
-                        ).first()
+                        suggestion = suggestions.get(coerce_id(point_data['inspection_suggestion_id']))
                         if suggestion:
                             new_point_data['inspection_suggestion'] = suggestion
                     
-                    new_point_data['last_synced'] = timezone.now()
+                    new_point_data['last_synced'] = now
                     new_point_data['sync_status'] = 'synced'
                     
-                    point = ObservationPoint.objects.create(**new_point_data)
+                    point = ObservationPoint(**new_point_data)
+                    point.clean_fields(exclude=['farm', 'inspection_suggestion'])
                     
-                    results.append({
-                        'mobile_id': mobile_id,
-                        'server_id': point.id,
-                        'status': 'created'
-                    })
-                    created_count += 1
+                    to_create.append(point)
+                    if point.mobile_id is not None:
+                        points_by_mobile_id[point.mobile_id] = point
+                    row_status = 'created'
+                
+                result = {
+                    'mobile_id': mobile_id,
+                    'server_id': None,
+                    'status': row_status
+                }
+                results.append(result)
+                staged.append((result, point))
             
             except Exception as e:
                 results.append({
@@ -200,24 +297,97 @@ class ObservationPointViewSet(viewsets.ModelViewSet):
                     'status': 'failed',
                     'message': str(e)
                 })
+        
+        log_writes = change_logger(request.user.pk, OBSERVATION_POINT)
+        
+        def on_write(created, updated):
+            log_writes(created, updated)
+            update_point_summaries(created, updated)
+        
+        # Write the whole batch with bulk_create/bulk_update
+        errors = bulk_write(
+            ObservationPoint, to_create, to_update, update_fields,
+            on_write=on_write,
+            version_field='version'
+        )
+        
+        # Bulk writes bypass the post_save signal, so drop cached pulls here
+        if to_create or to_update:
+            invalidate_pending_sync(request.user.pk, OBSERVATION_POINTS)
+        
+        for result, point in staged:
+            error = errors.get(id(point))
+            if error is None:
+                result['server_id'] = point.id
+                result['version'] = point.version
+            elif isinstance(error, VersionConflict):
+                result.update(self._conflict_result(result['mobile_id'], point.pk, error.server_version))
+            else:
+                del result['server_id']
+                result['status'] = 'failed'
+                result['message'] = error
+        
+        for result in results:
+            if result['status'] == 'created':
+                created_count += 1
+            elif result['status'] == 'updated':
+                updated_count += 1
+            elif result['status'] == 'unchanged':
+                unchanged_count += 1
+            elif result['status'] == 'conflict':
+                conflict_count += 1
+            else:
                 failed_count += 1
         
         return Response({
             'status': 'success',
             'created': created_count,
             'updated': updated_count,
+            'unchanged': unchanged_count,
+            'conflicts': conflict_count,
             'failed': failed_count,
             'results': results
         })
     
+    def _conflict_result(self, mobile_id, server_id, server_version):
+        return {
+            'mobile_id': mobile_id,
+            'server_id': server_id,
+            'status': 'conflict',
+            'server_version': server_version,
+            'message': 'Changed on the server since base_version; pull it and resend the delta'
+        }
+    
     @action(detail=False, methods=['get'])
     def pending_sync(self, request):
         """
         Get observation points that need to be synced to the mobile app.
         
         This endpoint returns observation points that have been updated on the server
-        since the last sync.
+        since the last sync, one page at a time ordered by (updated_at, id).
+        Pass the returned next_cursor as ?cursor= to fetch the following page
+        or to resume after a dropped connection.
+        
+        Each page also lists the observation points deleted since the cursor under
+        `deleted`. Cursors older than SYNC_TOMBSTONE_RETENTION get 410 Gone
+        and must resync from scratch.
+        
+        With `Accept: application/x-ndjson` every remaining row is streamed one
+        per line instead, followed by one `{"deleted": ...}` line per deletion,
+        and the final line carries next_cursor. With
+        `Accept: application/x-msgpack` results are returned as column arrays.
+        
+        Non-streamed pages are cached per user until the user's data changes.
+        Rows are read as value tuples and rendered by a ValuesSerializer, which
+        produces the same JSON as serializer_class without building instances;
+        serializers it cannot compile are used as they are.
         """
+        # Serve repeated polls from the per-user cache
+        if not self.wants_stream(request):
+            cached = get_cached_response(request, OBSERVATION_POINTS)
+            if cached is not None:
+                return cached
+        
         last_sync = request.query_params.get('last_sync')
         
         if last_sync:
@@ -231,10 +401,50 @@ class ObservationPointViewSet(viewsets.ModelViewSet):
                 )
         else:
             # If no last_sync provided, return all observation points
+            last_sync_time = None
             queryset = self.get_queryset()
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = SyncCursorPagination(
+            tombstones=Tombstone.objects.filter(user=request.user, entity=OBSERVATION_POINT),
+            deleted_since=last_sync_time
+        )
+        try:
+            if self.wants_stream(request):
+                # Stream every remaining row, then the deletions; the last line carries next_cursor
+                return self.stream_response(
+                    paginator.order_after_cursor(queryset, request),
+                    trailer=paginator.get_stream_trailer,
+                    tail=paginator.iter_deleted()
+                )
+            # Flat serializers render straight from value rows
+            values_serializer = values_serializer_for(
+                self.get_serializer_class(), context=self.get_serializer_context()
+            )
+            if values_serializer is not None:
+                page = paginator.paginate_queryset(
+                    values_serializer.rows(queryset, extra=KEYSET_COLUMNS), request, view=self
+                )
+            else:
+                page = paginator.paginate_queryset(queryset, request, view=self)
+        except CursorExpired:
+            return Response(
+                {'error': 'Deletions since this sync have been compacted. Resync without a cursor or last_sync'},
+                status=status.HTTP_410_GONE
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor. Use the next_cursor value from a previous response'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if values_serializer is not None:
+            data = values_serializer.serialize(page)
+        else:
+            data = self.get_serializer(page, many=True).data
+        if isinstance(request.accepted_renderer, MessagePackRenderer):
+            # Emit one array per field instead of one object per row
+            data = to_columns(data)
+        return store_response(request, OBSERVATION_POINTS, paginator.get_paginated_response(data))
 
 
 # URLs
@@ -0,0 +1,310 @@
+"""
+Django API Design for Resumable Profile Picture Uploads
+
+This file outlines the models, serializers, views and worker pool for
+uploading profile pictures in resumable chunks and producing resized
+variants off the request path.
+
+Protocol:
+    POST  /api/profile-picture-uploads/       {filename, content_type, total_size}
+    HEAD  /api/profile-picture-uploads/<id>/  -> Upload-Offset to resume from
+    PATCH /api/profile-picture-uploads/<id>/  raw chunk, Upload-Offset header
+
+The picture is saved to the profile when the last byte arrives, and its
+thumbnail and medium variants are rendered by a process pool and cached in
+MEDIA_ROOT. Requires FileSystemStorage, since workers read and write paths.
+"""
+
+# Models
+import uuid
+
+from django.db import models
+from django.contrib.auth.models import User
+
+class ProfilePictureUpload(models.Model):
+    """
+    Model for an in-progress resumable profile picture upload.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='profile_picture_uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    total_size = models.PositiveIntegerField()
+    received_size = models.PositiveIntegerField(default=0)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('uploading', 'Uploading'),
+            ('complete', 'Complete'),
+        ],
+        default='uploading'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_name(self):
+        """
+        Storage name of the partially received file.
+        """
+        return f'profile_pictures/uploads/{self.id}.part'
+
+    def __str__(self):
+        return f"Profile Picture Upload {self.id} - {self.received_size}/{self.total_size} bytes"
+
+
+# Serializers
+from django.conf import settings
+from rest_framework import serializers
+
+class ProfilePictureUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for starting and resuming a profile picture upload.
+    """
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProfilePictureUpload
+        fields = (
+            'id', 'filename', 'content_type', 'total_size', 'received_size',
+            'status', 'chunk_size', 'created_at'
+        )
+        read_only_fields = ('id', 'received_size', 'status', 'chunk_size', 'created_at')
+
+    def get_chunk_size(self, obj):
+        return getattr(settings, 'PROFILE_PICTURE_CHUNK_SIZE', 512 * 1024)
+
+    def validate_content_type(self, value):
+        if not value.startswith('image/'):
+            raise serializers.ValidationError('Only image uploads are accepted.')
+        return value
+
+    def validate_total_size(self, value):
+        max_size = getattr(settings, 'PROFILE_PICTURE_MAX_SIZE', 10 * 1024 * 1024)
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(f'Size must be between 1 and {max_size} bytes.')
+        return value
+
+
+# Worker pool
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from .image_variants import render_variants
+from .user_profile_sync import UserProfile
+
+logger = logging.getLogger('api')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the process pool that renders picture variants, starting it on first use.
+
+    Workers are spawned rather than forked so they do not inherit the
+    request thread's database connections.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PROFILE_PICTURE_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+
+def schedule_picture_variants(profile):
+    """
+    Render the profile picture's variants in the worker pool.
+    """
+    picture_name = profile.profile_picture.name
+    if not picture_name:
+        return
+    future = get_executor().submit(render_variants, default_storage.path(picture_name))
+    future.add_done_callback(functools.partial(_store_variants, profile.pk, picture_name))
+
+
+def _store_variants(profile_id, picture_name, future):
+    """
+    Record rendered variants on the profile, unless its picture changed meanwhile.
+    """
+    try:
+        paths = future.result()
+    except Exception:
+        logger.exception('Rendering variants of %s failed', picture_name)
+        return
+
+    media_root = Path(settings.MEDIA_ROOT)
+    variants = {
+        name: Path(path).relative_to(media_root).as_posix()
+        for name, path in paths.items()
+    }
+    try:
+        UserProfile.objects.filter(pk=profile_id, profile_picture=picture_name).update(
+            profile_picture_variants=variants,
+            updated_at=timezone.now()
+        )
+    finally:
+        # Callbacks run on a pool thread, which must not leak its connection
+        connections.close_all()
+
+
+# Parsers
+from rest_framework.parsers import BaseParser
+
+class RawChunkParser(BaseParser):
+    """
+    Parser that hands the raw request body to the view as bytes.
+    """
+    media_type = 'application/offset+octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read() if stream is not None else b''
+
+
+# Views
+import os
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from PIL import Image
+from rest_framework import mixins, status, viewsets
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+class ProfilePictureUploadViewSet(mixins.CreateModelMixin,
+                                  mixins.RetrieveModelMixin,
+                                  viewsets.GenericViewSet):
+    """
+    ViewSet for resumable, chunked profile picture uploads.
+    """
+    serializer_class = ProfilePictureUploadSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, RawChunkParser]
+
+    def get_queryset(self):
+        """
+        Return the authenticated user's uploads.
+        """
+        return ProfilePictureUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        """
+        Start an upload, dropping the user's abandoned ones first.
+        """
+        ttl = timedelta(seconds=getattr(settings, 'PROFILE_PICTURE_UPLOAD_TTL', 24 * 60 * 60))
+        for stale in self.get_queryset().filter(updated_at__lt=timezone.now() - ttl):
+            default_storage.delete(stale.part_name)
+            stale.delete()
+        serializer.save(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Report how many bytes have been received, so the client can resume.
+        """
+        upload = self.get_object()
+        return Response(self.get_serializer(upload).data, headers=self._offset_headers(upload))
+
+    def partial_update(self, request, pk=None):
+        """
+        Append one chunk at the Upload-Offset the client sends.
+        """
+        chunk = request.data
+        if not isinstance(chunk, bytes) or not chunk:
+            return Response(
+                {'error': f'Send a non-empty chunk as {RawChunkParser.media_type}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_chunk = getattr(settings, 'PROFILE_PICTURE_CHUNK_SIZE', 512 * 1024)
+        if len(chunk) > max_chunk:
+            return Response(
+                {'error': f'Chunks must be at most {max_chunk} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            if upload.status != 'uploading' or offset != upload.received_size:
+                return Response(
+                    {'error': 'Upload-Offset does not match the received size'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers=self._offset_headers(upload)
+                )
+            if offset + len(chunk) > upload.total_size:
+                return Response(
+                    {'error': 'Chunk extends past the declared total_size'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                    headers=self._offset_headers(upload)
+                )
+
+            part_path = default_storage.path(upload.part_name)
+            os.makedirs(os.path.dirname(part_path), exist_ok=True)
+            with open(part_path, 'r+b' if offset else 'wb') as part:
+                part.seek(offset)
+                part.write(chunk)
+
+            upload.received_size += len(chunk)
+            upload.save(update_fields=['received_size', 'updated_at'])
+
+            if upload.received_size == upload.total_size:
+                return self._complete(upload)
+
+        return Response(self.get_serializer(upload).data, headers=self._offset_headers(upload))
+
+    def _complete(self, upload):
+        """
+        Save the assembled file as the profile picture and schedule its variants.
+        """
+        from .user_profile_sync import UserProfileSerializer
+
+        part_path = default_storage.path(upload.part_name)
+        try:
+            with Image.open(part_path) as image:
+                image.verify()
+        except Exception:
+            default_storage.delete(upload.part_name)
+            upload.delete()
+            return Response({'error': 'Uploaded file is not a valid image'}, status=status.HTTP_400_BAD_REQUEST)
+
+        profile = self.request.user.profile
+        with open(part_path, 'rb') as part:
+            profile.profile_picture.save(upload.filename, File(part), save=False)
+        profile.profile_picture_variants = {}
+        profile.last_synced = timezone.now()
+        profile.sync_status = 'synced'
+        profile.save()
+
+        default_storage.delete(upload.part_name)
+        upload.status = 'complete'
+        upload.save(update_fields=['status', 'updated_at'])
+
+        # Render variants only once the new picture is committed
+        transaction.on_commit(lambda: schedule_picture_variants(profile))
+        return Response(
+            UserProfileSerializer(profile, context=self.get_serializer_context()).data,
+            headers=self._offset_headers(upload)
+        )
+
+    def _offset_headers(self, upload):
+        return {
+            'Upload-Offset': str(upload.received_size),
+            'Upload-Length': str(upload.total_size),
+        }
@@ -0,0 +1,193 @@
+"""
+Django API Design for Query Plan Regression Checks (management/commands/check_query_plans.py)
+
+This file outlines a command that seeds realistically sized tables inside a
+transaction, runs ANALYZE, and asserts through EXPLAIN that the hot sync
+queries use their intended indexes rather than sequential scans. The
+transaction is rolled back afterwards, and the command exits non-zero on any
+regression, so it can gate CI against a scratch PostgreSQL database:
+
+    python manage.py check_query_plans --points 200000
+"""
+
+import json
+import random
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import Farm, InspectionSuggestion, ObservationPoint
+
+# index is the index the plan must use, or None for any index on table
+PlanCheck = namedtuple('PlanCheck', 'name queryset table index')
+
+
+def plan_scans(plan):
+    """
+    Yield (node type, relation, index) for every node of an EXPLAIN JSON plan.
+    """
+    yield plan['Node Type'], plan.get('Relation Name'), plan.get('Index Name')
+    for child in plan.get('Plans', []):
+        yield from plan_scans(child)
+
+
+def hot_queries(user, farm, now):
+    """
+    Return the checks for the queries the sync endpoints run on every call.
+    """
+    points = ObservationPoint._meta.db_table
+    suggestions = InspectionSuggestion._meta.db_table
+    cursor = Q(updated_at__gt=now - timedelta(days=1)) | Q(updated_at=now - timedelta(days=1), id__gt=0)
+    mobile_ids = list(
+        ObservationPoint.objects.filter(farm=farm).values_list('mobile_id', flat=True)[:500]
+    )
+    return [
+        PlanCheck(
+            'observation points pending_sync page',
+            ObservationPoint.objects.filter(farm__user=user).filter(cursor).order_by('updated_at', 'id')[:501],
+            points,
+            'obs_point_farm_sync_idx',
+        ),
+        PlanCheck(
+            'inspection suggestions pending_sync page',
+            InspectionSuggestion.objects.filter(user=user).filter(cursor).order_by('updated_at', 'id')[:501],
+            suggestions,
+            'insp_sugg_user_sync_idx',
+        ),
+        PlanCheck(
+            'observation point sync mobile_id lookup',
+            ObservationPoint.objects.filter(mobile_id__in=mobile_ids),
+            points,
+            None,
+        ),
+        PlanCheck(
+            'suggestion propagation to a farm\'s points',
+            ObservationPoint.objects.filter(farm=farm),
+            points,
+            'obs_point_farm_sync_idx',
+        ),
+        PlanCheck(
+            'pending observation points of a farm',
+            ObservationPoint.objects.filter(farm=farm, sync_status='pending'),
+            points,
+            'obs_point_pending_idx',
+        ),
+        PlanCheck(
+            'pending inspection suggestions of a user',
+            InspectionSuggestion.objects.filter(user=user, sync_status='pending'),
+            suggestions,
+            'insp_sugg_pending_idx',
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Assert that the hot sync queries use index scans at realistic table sizes.
+    """
+    help = 'Check via EXPLAIN that the sync queries use their indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Users to seed.')
+        parser.add_argument('--farms', type=int, default=4, help='Farms per user.')
+        parser.add_argument('--points', type=int, default=200000, help='Observation points to seed.')
+        parser.add_argument('--pending-ratio', type=float, default=0.01,
+                            help='Share of rows left with sync_status=pending.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plan checks need PostgreSQL.')
+
+        with transaction.atomic():
+            user, farm, now = self.seed(options)
+            failures = [check for check in hot_queries(user, farm, now) if not self.check(check)]
+            # Never keep the seeded rows
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{len(failures)} query plan check(s) failed')
+        self.stdout.write(self.style.SUCCESS('All query plan checks passed'))
+
+    def seed(self, options):
+        """
+        Insert the synthetic tables and refresh planner statistics.
+
+        Returns a user, one of its farms and the reference time.
+        """
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(username=f'plan-check-{index}') for index in range(options['users'])
+        ])
+        farms = Farm.objects.bulk_create([
+            Farm(user=user, name=f'Farm {index}', size=10, plant_type='Mango')
+            for user in users for index in range(options['farms'])
+        ])
+        suggestions = InspectionSuggestion.objects.bulk_create([
+            InspectionSuggestion(
+                user=farm.user,
+                property_location=farm,
+                target_entity='Fruit Fly',
+                confidence_level='High',
+                area_size=10,
+                density_of_plant=500,
+                sync_status='pending' if rng.random() < options['pending_ratio'] else 'synced'
+            )
+            for farm in farms for _ in range(5)
+        ], batch_size=5000)
+        ObservationPoint.objects.bulk_create([
+            ObservationPoint(
+                farm=farms[index % len(farms)],
+                latitude=-12.46 + rng.uniform(-0.01, 0.01),
+                longitude=130.84 + rng.uniform(-0.01, 0.01),
+                segment=index % 12 + 1,
+                mobile_id=2_000_000_000 - index,
+                sync_status='pending' if rng.random() < options['pending_ratio'] else 'synced'
+            )
+            for index in range(options['points'])
+        ], batch_size=5000)
+
+        with connection.cursor() as cursor:
+            # auto_now stamps every row alike; spread them like a real history
+            for model in (ObservationPoint, InspectionSuggestion):
+                cursor.execute(
+                    f"UPDATE {model._meta.db_table} "
+                    f"SET updated_at = %s - random() * interval '90 days'",
+                    [now]
+                )
+            for model in (User, Farm, ObservationPoint, InspectionSuggestion):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+        self.stdout.write(
+            f'Seeded {len(users)} users, {len(farms)} farms, '
+            f'{len(suggestions)} suggestions and {options["points"]} observation points'
+        )
+        return users[0], farms[0], now
+
+    def check(self, check):
+        """
+        Explain one query and report whether its plan meets the expectation.
+        """
+        plan = json.loads(check.queryset.explain(format='json'))[0]['Plan']
+        scans = list(plan_scans(plan))
+        seq_scan = any(node == 'Seq Scan' and relation == check.table for node, relation, _ in scans)
+        if check.index is None:
+            used_index = any(index and (relation in (check.table, None)) for _, relation, index in scans)
+        else:
+            used_index = any(index == check.index for _, _, index in scans)
+
+        passed = used_index and not seq_scan
+        summary = ', '.join(
+            f'{node}' + (f' on {relation}' if relation else '') + (f' using {index}' if index else '')
+            for node, relation, index in scans
+            if relation or index
+        )
+        label = self.style.SUCCESS('PASS') if passed else self.style.ERROR('FAIL')
+        self.stdout.write(f'{label} {check.name}: {summary}')
+        return passed
@@ -0,0 +1,273 @@
+"""
+Django API Design for Sync Upload Backpressure
+
+This file outlines the admission control in front of the sync upload
+endpoints. Every upload's processing time feeds a moving average of seconds
+per row, from which the server derives the batch size it can process within
+SYNC_TARGET_BATCH_SECONDS. That size is advertised in the
+`X-Sync-Batch-Size` header and `recommended_batch_size` field. Larger
+uploads have a prefix of that size accepted, and the response carries
+`resume_from` markers for the lists that were cut short. Uploads that arrive
+while SYNC_MAX_CONCURRENT_UPLOADS are already being processed get 429 with
+`Retry-After` instead of queueing on the database; the slot is taken before
+the Idempotency-Key is claimed, so a rejection touches no table.
+
+SYNC_MAX_CONCURRENT_UPLOADS is a total for the deployment. Its slots are
+leased keys in the shared SYNC_UPLOAD_SLOT_CACHE_ALIAS cache, so the limit
+holds however many single-threaded worker processes serve the uploads, and
+a slot whose process died frees itself after SYNC_UPLOAD_SLOT_LEASE
+seconds. The seconds-per-row average is kept per process.
+"""
+
+import functools
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.response import Response
+from .bulk_sync import get_commit_chunk_size
+
+BATCH_SIZE_HEADER = 'X-Sync-Batch-Size'
+
+# Weight of the newest sample in the seconds-per-row moving average
+SMOOTHING = 0.2
+
+_lock = threading.Lock()
+_seconds_per_row = None
+_rejected = 0
+
+
+def _get_slot_cache():
+    alias = getattr(settings, 'SYNC_UPLOAD_SLOT_CACHE_ALIAS', 'sync')
+    cache = caches[alias]
+    # Slots kept per process would let every process admit the full limit
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f'SYNC_UPLOAD_SLOT_CACHE_ALIAS ({alias!r}) must name a cache shared between worker processes'
+        )
+    return cache
+
+
+def acquire_slot():
+    """
+    Lease one of the deployment's SYNC_MAX_CONCURRENT_UPLOADS upload slots.
+
+    Returns the (key, token) of the slot, or None if all are taken.
+    """
+    cache = _get_slot_cache()
+    token = uuid.uuid4().hex
+    lease = getattr(settings, 'SYNC_UPLOAD_SLOT_LEASE', 600)
+    slots = list(range(getattr(settings, 'SYNC_MAX_CONCURRENT_UPLOADS', 8)))
+    # Starting at a random slot spreads the attempts of concurrent requests
+    random.shuffle(slots)
+    for slot in slots:
+        key = f'sync-upload-slot:{slot}'
+        if cache.add(key, token, timeout=lease):
+            return key, token
+    return None
+
+
+def release_slot(slot):
+    """
+    Give back a slot taken by acquire_slot, unless its lease has already passed to another upload.
+    """
+    key, token = slot
+    cache = _get_slot_cache()
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def record_upload(rows, seconds):
+    """
+    Fold one processed upload into the seconds-per-row average.
+    """
+    global _seconds_per_row
+    if rows <= 0:
+        return
+    sample = seconds / rows
+    with _lock:
+        if _seconds_per_row is None:
+            _seconds_per_row = sample
+        else:
+            _seconds_per_row += SMOOTHING * (sample - _seconds_per_row)
+
+
+def recommended_batch_size():
+    """
+    Return the number of rows this process expects to sync within SYNC_TARGET_BATCH_SECONDS.
+    """
+    minimum = getattr(settings, 'SYNC_MIN_BATCH_SIZE', 50)
+    maximum = getattr(settings, 'SYNC_MAX_BATCH_SIZE', 5000)
+    if _seconds_per_row is None:
+        return max(minimum, min(get_commit_chunk_size(), maximum))
+    target = getattr(settings, 'SYNC_TARGET_BATCH_SECONDS', 2.0)
+    return max(minimum, min(int(target / max(_seconds_per_row, 1e-6)), maximum))
+
+
+def retry_after():
+    """
+    Return the seconds a rejected client should wait, about one upload's duration.
+    """
+    estimate = (_seconds_per_row or 0) * recommended_batch_size()
+    return max(1, min(math.ceil(estimate), 30))
+
+
+def get_backpressure_stats():
+    """
+    Return the current recommendation and rejection count, for /metrics.
+    """
+    return {
+        'recommended_batch_size': recommended_batch_size(),
+        'seconds_per_row': _seconds_per_row,
+        'rejected': _rejected,
+    }
+
+
+def _truncate(data, keys, budget):
+    """
+    Cut the lists under keys in data down to budget rows in total, in order.
+
+    Returns a dict mapping each truncated key to the index to resume from.
+    Bodies that are not objects are left for the view to reject.
+    """
+    resume_from = {}
+    if not isinstance(data, dict):
+        return resume_from
+    for key in keys:
+        rows = data.get(key)
+        if not isinstance(rows, list):
+            continue
+        if len(rows) > budget:
+            data[key] = rows[:budget]
+            resume_from[key] = budget
+        budget -= len(data[key])
+    return resume_from
+
+
+def _count_rows(data, keys):
+    if not isinstance(data, dict):
+        return 0
+    return sum(len(data[key]) for key in keys if isinstance(data.get(key), list))
+
+
+def _get_request(args):
+    return args[0] if isinstance(args[0], Request) else args[1]
+
+
+def _exempt(request):
+    # Reads, views nested in an admitted one, and the sync workers
+    return (request.method in SAFE_METHODS or getattr(request, '_backpressure_active', False)
+            or getattr(request, '_upload_exempt', False))
+
+
+def _reject():
+    global _rejected
+    with _lock:
+        _rejected += 1
+    return Response(
+        {'error': 'The server is busy syncing other uploads. Retry later'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={
+            'Retry-After': str(retry_after()),
+            BATCH_SIZE_HEADER: str(recommended_batch_size()),
+        }
+    )
+
+
+def admit_upload(exempt_async=False):
+    """
+    Take an upload slot for a DRF sync view or action before anything else runs.
+
+    Apply it outside idempotent, so an upload rejected with 429 costs no
+    database work; backpressure, inside idempotent, then uses the slot taken
+    here. exempt_async lets uploads queued with ?async=1 through, for views
+    that queue them (sync_data); views that would process such an upload
+    inline must not set it.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from .sync_jobs import wants_async
+
+            request = _get_request(args)
+            if exempt_async and wants_async(request):
+                request._upload_exempt = True
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    request._upload_exempt = False
+            if _exempt(request) or getattr(request, '_upload_slot', None):
+                return view(*args, **kwargs)
+
+            slot = acquire_slot()
+            if slot is None:
+                return _reject()
+            request._upload_slot = slot
+            try:
+                return view(*args, **kwargs)
+            finally:
+                request._upload_slot = None
+                release_slot(slot)
+        return wrapper
+    return decorator
+
+
+def backpressure(*keys):
+    """
+    Apply admission control and batch truncation to a DRF sync view or action.
+
+    keys are the request.data lists the view processes, in the order they
+    are synced. Views called from inside another one (as sync_data calls the
+    entity syncs) run as they are, since the outer view has already been
+    admitted and its lists truncated. Reads, uploads admit_upload exempted
+    and the sync workers are exempt; workers drain the queue at their own
+    pace. Apply it inside idempotent, so the stored response keeps its
+    resume_from, and admit_upload outside it; without admit_upload the slot
+    is taken here.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = _get_request(args)
+            if _exempt(request):
+                return view(*args, **kwargs)
+
+            slot = None
+            if not getattr(request, '_upload_slot', None):
+                slot = acquire_slot()
+                if slot is None:
+                    return _reject()
+
+            request._backpressure_active = True
+            try:
+                resume_from = _truncate(request.data, keys, recommended_batch_size())
+                rows = _count_rows(request.data, keys)
+                start = time.perf_counter()
+                response = view(*args, **kwargs)
+                # Rejected uploads return before doing the work and would skew the average
+                if response.status_code < 400:
+                    record_upload(rows, time.perf_counter() - start)
+            finally:
+                request._backpressure_active = False
+                if slot is not None:
+                    release_slot(slot)
+
+            batch_size = recommended_batch_size()
+            response[BATCH_SIZE_HEADER] = str(batch_size)
+            if isinstance(getattr(response, 'data', None), dict) and response.status_code < 400:
+                response.data['recommended_batch_size'] = batch_size
+                if resume_from:
+                    response.data['resume_from'] = resume_from
+            return response
+        return wrapper
+    return decorator
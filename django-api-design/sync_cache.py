@@ -0,0 +1,178 @@
+"""
+Django API Design for the pending_sync Response Cache
+
+This file outlines the per-user cache in front of the pending_sync endpoints.
+Pages are cached in the `sync` cache alias, keyed on
+(user, entity, generation, query parameters). Writes never delete entries;
+they replace the (user, entity) generation token once the transaction
+commits, which makes every older page unreachable in O(1). Signals cover
+ordinary saves and deletes, and the bulk sync paths, which bypass signals,
+invalidate explicitly. The alias must be shared between worker processes,
+so a write handled by one process invalidates the pages of all of them.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.response import Response
+from .sync_tombstones import farm_owner_id
+
+OBSERVATION_POINTS = 'observation-points'
+INSPECTION_SUGGESTIONS = 'inspection-suggestions'
+ALL_ENTITIES = (OBSERVATION_POINTS, INSPECTION_SUGGESTIONS)
+
+STATS_KEYS = {
+    'hits': 'sync-cache:stats:hits',
+    'misses': 'sync-cache:stats:misses',
+}
+
+
+def get_cache():
+    alias = getattr(settings, 'SYNC_CACHE_ALIAS', 'sync')
+    cache = caches[alias]
+    # A generation bumped in one process would leave the others serving stale pages
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(f'SYNC_CACHE_ALIAS ({alias!r}) must name a cache shared between worker processes')
+    return cache
+
+
+def _generation_key(user_id, entity):
+    return f'sync-cache:generation:{entity}:{user_id}'
+
+
+def _get_generation(user_id, entity):
+    """
+    Return the current generation token for (user, entity), creating one if missing.
+    """
+    cache = get_cache()
+    key = _generation_key(user_id, entity)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _entry_key(request, entity):
+    """
+    Build the cache key for a pending_sync request.
+    """
+    params = sorted(request.query_params.lists())
+    renderer = getattr(request, 'accepted_media_type', '')
+    digest = hashlib.sha256(repr((params, renderer)).encode('utf-8')).hexdigest()
+    generation = _get_generation(request.user.pk, entity)
+    return f'sync-cache:page:{entity}:{request.user.pk}:{generation}:{digest}'
+
+
+def _count(name):
+    cache = get_cache()
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_cached_response(request, entity):
+    """
+    Return the cached pending_sync response for request, or None on a miss.
+
+    The key is computed before the queryset is read and remembered on the
+    request, so a write that lands mid-request makes the stored page stale
+    on arrival rather than serving it later.
+    """
+    key = _entry_key(request, entity)
+    data = get_cache().get(key)
+    if data is None:
+        _count('misses')
+        request._pending_sync_cache_key = key
+        return None
+    _count('hits')
+    return Response(data, headers={'X-Cache': 'HIT'})
+
+
+def store_response(request, entity, response):
+    """
+    Cache a successful pending_sync response computed after a miss.
+    """
+    key = getattr(request, '_pending_sync_cache_key', None)
+    if key is not None and response.status_code == 200:
+        get_cache().set(key, response.data, getattr(settings, 'SYNC_CACHE_TTL', 300))
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def invalidate_pending_sync(user_id, *entities):
+    """
+    Make the user's cached pending_sync pages for entities unreachable after commit.
+    """
+    entities = entities or ALL_ENTITIES
+
+    def bump():
+        get_cache().set_many(
+            {_generation_key(user_id, entity): uuid.uuid4().hex for entity in entities},
+            timeout=None
+        )
+
+    transaction.on_commit(bump)
+
+
+def get_cache_stats():
+    """
+    Return the hit/miss counters of the pending_sync cache.
+    """
+    values = get_cache().get_many(STATS_KEYS.values())
+    hits = values.get(STATS_KEYS['hits'], 0)
+    misses = values.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
+
+
+# Signals
+@receiver(post_save, sender='api.ObservationPoint')
+@receiver(post_delete, sender='api.ObservationPoint')
+def invalidate_observation_point(sender, instance, origin=None, **kwargs):
+    # Cascades from a farm are covered by the farm's own invalidation, and
+    # queryset deletes invalidate once for the whole delete
+    if (isinstance(origin, models.Model) and origin is not instance) or isinstance(origin, models.QuerySet):
+        return
+    invalidate_pending_sync(farm_owner_id(instance), OBSERVATION_POINTS)
+
+
+@receiver(post_save, sender='api.InspectionSuggestion')
+@receiver(post_delete, sender='api.InspectionSuggestion')
+def invalidate_inspection_suggestion(sender, instance, **kwargs):
+    # Deleting a suggestion also nulls the FK on its observation points
+    invalidate_pending_sync(instance.user_id, *ALL_ENTITIES)
+
+
+@receiver(post_save, sender='api.Farm')
+@receiver(post_delete, sender='api.Farm')
+def invalidate_farm(sender, instance, **kwargs):
+    invalidate_pending_sync(instance.user_id, *ALL_ENTITIES)
+
+
+# Views
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def pending_sync_cache_stats(request):
+    """
+    Return the pending_sync cache hit/miss counters.
+    """
+    return Response(get_cache_stats())
@@ -0,0 +1,373 @@
+"""
+Django API Design for the Sync Change Log
+
+This file outlines the append-only change log that replaces timestamp-based
+change detection. Every create, update or delete of a synced model appends a
+ChangeLogEntry in the same transaction as the change, and clients pull
+`GET /api/changes/?after=<seq>` with one range scan over (user, seq) instead
+of comparing updated_at against their own clock on every entity table.
+
+Sequence numbers are handed out after commit, one batch at a time under a
+lock on the ChangeSequence row, so they become visible in increasing order:
+a client that has seen seq N will never later find a committed change below
+N, however the writing transactions interleaved.
+"""
+
+# Models
+from django.db import models
+from django.contrib.auth.models import User
+from .sync_tombstones import FARM, INSPECTION_SUGGESTION, OBSERVATION_POINT
+
+BOUNDARY_POINT = 'boundary_point'
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+class ChangeLogEntry(models.Model):
+    """
+    Model for one change to a synced row, in global sequence order.
+    """
+    id = models.BigAutoField(primary_key=True)
+    # Assigned after commit by assign_sequence_numbers
+    seq = models.BigIntegerField(unique=True, null=True, blank=True)
+    # Indexed by the leading column of changelog_user_seq_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='changes', db_index=False)
+    entity = models.CharField(
+        max_length=50,
+        choices=[
+            (FARM, 'Farm'),
+            (BOUNDARY_POINT, 'Boundary Point'),
+            (OBSERVATION_POINT, 'Observation Point'),
+            (INSPECTION_SUGGESTION, 'Inspection Suggestion'),
+        ]
+    )
+    object_id = models.BigIntegerField()
+    mobile_id = models.IntegerField(null=True, blank=True)
+    operation = models.CharField(
+        max_length=10,
+        choices=[
+            (CREATE, 'Create'),
+            (UPDATE, 'Update'),
+            (DELETE, 'Delete'),
+        ]
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Pulls: seq > N for one user
+            models.Index(fields=['user', 'seq'], name='changelog_user_seq_idx'),
+            # Only the entries still waiting for a sequence number
+            models.Index(
+                fields=['id'],
+                name='changelog_unsequenced_idx',
+                condition=models.Q(seq__isnull=True)
+            ),
+            # Compaction
+            models.Index(fields=['created_at'], name='changelog_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.seq} {self.operation} {self.entity} {self.object_id}"
+
+
+class ChangeSequence(models.Model):
+    """
+    Singleton row holding the last assigned sequence number.
+    """
+    value = models.BigIntegerField(default=0)
+    # Entries up to this seq have been compacted away
+    compacted_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Change sequence at {self.value}"
+
+
+# Recording
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from .bulk_sync import get_batch_size, get_commit_chunk_size
+from .sync_tombstones import get_retention_horizon
+
+logger = logging.getLogger('api')
+
+_last_compaction = 0.0
+
+
+def record_changes(entries):
+    """
+    Append ChangeLogEntry instances in the caller's transaction.
+
+    They are sequenced once that transaction commits.
+    """
+    if not entries:
+        return
+    ChangeLogEntry.objects.bulk_create(entries, batch_size=get_batch_size())
+    transaction.on_commit(_sequence_after_commit)
+
+
+def log_changes(user_id, entity, rows, operation):
+    """
+    Record the same operation on (id, mobile_id) rows of one user's entity.
+    """
+    record_changes([
+        ChangeLogEntry(
+            user_id=user_id,
+            entity=entity,
+            object_id=pk,
+            mobile_id=mobile_id,
+            operation=operation
+        )
+        for pk, mobile_id in rows
+    ])
+
+
+def change_logger(user_id, entity):
+    """
+    Return a bulk_write on_write hook that logs the written rows as changes.
+    """
+    def on_write(created, updated):
+        log_changes(user_id, entity, [(obj.pk, obj.mobile_id) for obj in created], CREATE)
+        log_changes(user_id, entity, [(obj.pk, obj.mobile_id) for obj in updated], UPDATE)
+    return on_write
+
+
+def assign_sequence_numbers():
+    """
+    Give committed, unsequenced changes the next global sequence numbers.
+
+    Returns the number of entries sequenced.
+    """
+    if not ChangeLogEntry.objects.filter(seq__isnull=True).exists():
+        return 0
+    batch = get_commit_chunk_size()
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Serializes sequencers, so seq order is visibility order
+            sequence, _ = ChangeSequence.objects.select_for_update().get_or_create(pk=1)
+            pending = list(ChangeLogEntry.objects.filter(seq__isnull=True).order_by('id')[:batch])
+            for entry in pending:
+                sequence.value += 1
+                entry.seq = sequence.value
+            ChangeLogEntry.objects.bulk_update(pending, ['seq'], batch_size=get_batch_size())
+            sequence.save(update_fields=['value'])
+        total += len(pending)
+        if len(pending) < batch:
+            return total
+
+
+def _sequence_after_commit():
+    # The change itself is committed; a failed sequencing run is retried by the sync workers
+    try:
+        assign_sequence_numbers()
+    except Exception:
+        logger.exception('Sequencing change log entries failed')
+
+
+def compact_change_log(force=False):
+    """
+    Delete changes older than the tombstone retention horizon.
+
+    Runs at most once per SYNC_TOMBSTONE_COMPACT_INTERVAL per process unless
+    force is set. Returns the number of entries deleted.
+    """
+    global _last_compaction
+    interval = getattr(settings, 'SYNC_TOMBSTONE_COMPACT_INTERVAL', 60 * 60)
+    if not force and time.monotonic() - _last_compaction < interval:
+        return 0
+    _last_compaction = time.monotonic()
+
+    expired = ChangeLogEntry.objects.filter(created_at__lt=get_retention_horizon(), seq__isnull=False)
+    with transaction.atomic():
+        sequence, _ = ChangeSequence.objects.select_for_update().get_or_create(pk=1)
+        through = expired.aggregate(through=models.Max('seq'))['through']
+        if through is None:
+            return 0
+        deleted, _ = ChangeLogEntry.objects.filter(seq__lte=through).delete()
+        sequence.compacted_through = max(sequence.compacted_through, through)
+        sequence.save(update_fields=['compacted_through'])
+    return deleted
+
+
+# Signals
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .sync_tombstones import covered_by_caller, farm_owner_id, origin_model_name
+
+
+def _log_saved(entity, user_id, instance, created):
+    log_changes(
+        user_id,
+        entity,
+        [(instance.pk, getattr(instance, 'mobile_id', None))],
+        CREATE if created else UPDATE
+    )
+
+
+def _log_deleted(entity, user_id, instance, origin):
+    if covered_by_caller(origin):
+        return
+    log_changes(user_id, entity, [(instance.pk, getattr(instance, 'mobile_id', None))], DELETE)
+
+
+@receiver(post_save, sender='api.Farm')
+def log_farm_save(sender, instance, created, **kwargs):
+    _log_saved(FARM, instance.user_id, instance, created)
+
+
+@receiver(post_save, sender='api.BoundaryPoint')
+def log_boundary_point_save(sender, instance, created, **kwargs):
+    _log_saved(BOUNDARY_POINT, farm_owner_id(instance), instance, created)
+
+
+@receiver(post_save, sender='api.ObservationPoint')
+def log_observation_point_save(sender, instance, created, **kwargs):
+    _log_saved(OBSERVATION_POINT, farm_owner_id(instance), instance, created)
+
+
+@receiver(post_save, sender='api.InspectionSuggestion')
+def log_inspection_suggestion_save(sender, instance, created, **kwargs):
+    _log_saved(INSPECTION_SUGGESTION, instance.user_id, instance, created)
+
+
+@receiver(post_delete, sender='api.BoundaryPoint')
+def log_boundary_point_delete(sender, instance, origin=None, **kwargs):
+    _log_deleted(BOUNDARY_POINT, farm_owner_id(instance), instance, origin)
+
+
+@receiver(post_delete, sender='api.ObservationPoint')
+def log_observation_point_delete(sender, instance, origin=None, **kwargs):
+    _log_deleted(OBSERVATION_POINT, farm_owner_id(instance), instance, origin)
+
+
+@receiver(post_delete, sender='api.InspectionSuggestion')
+def log_inspection_suggestion_delete(sender, instance, origin=None, **kwargs):
+    _log_deleted(INSPECTION_SUGGESTION, instance.user_id, instance, origin)
+
+
+@receiver(pre_delete, sender='api.Farm')
+def log_farm_delete(sender, instance, origin=None, **kwargs):
+    # A deleted user's log goes with it
+    if origin_model_name(origin) == 'user':
+        return
+    log_changes(instance.user_id, FARM, [(instance.pk, getattr(instance, 'mobile_id', None))], DELETE)
+    boundary_points = apps.get_model('api', 'BoundaryPoint').objects.filter(farm=instance)
+    log_changes(instance.user_id, BOUNDARY_POINT, [(pk, None) for pk in boundary_points.values_list('id', flat=True)], DELETE)
+    log_changes(instance.user_id, OBSERVATION_POINT, instance.observation_points.values_list('id', 'mobile_id'), DELETE)
+    log_changes(
+        instance.user_id,
+        INSPECTION_SUGGESTION,
+        instance.inspection_suggestions.values_list('id', 'mobile_id'),
+        DELETE
+    )
+
+
+# Views
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .sync_pagination import SyncCursorPagination
+from .fast_serializers import values_serializer_for
+
+
+def serialize_changes(entries, context):
+    """
+    Return the API representation of a page of changes.
+
+    Only the newest change per row is kept, and created or updated rows
+    carry their current data, fetched with one query per entity and rendered
+    from value rows where the entity's serializer is flat.
+    """
+    from .views import BoundaryPointViewSet, FarmViewSet, InspectionSuggestionViewSet, ObservationPointViewSet
+
+    serializer_classes = {
+        FARM: FarmViewSet.serializer_class,
+        BOUNDARY_POINT: BoundaryPointViewSet.serializer_class,
+        OBSERVATION_POINT: ObservationPointViewSet.serializer_class,
+        INSPECTION_SUGGESTION: InspectionSuggestionViewSet.serializer_class,
+    }
+
+    latest = {}
+    for entry in entries:
+        # Re-insert so the dict stays in seq order of each row's newest change
+        latest.pop((entry.entity, entry.object_id), None)
+        latest[(entry.entity, entry.object_id)] = entry
+
+    rows = {}
+    for entity, serializer_class in serializer_classes.items():
+        ids = [
+            entry.object_id for entry in latest.values()
+            if entry.entity == entity and entry.operation != DELETE
+        ]
+        if not ids:
+            continue
+        values_serializer = values_serializer_for(serializer_class, context=context)
+        if values_serializer is not None:
+            rows[entity] = values_serializer.in_bulk(serializer_class.Meta.model.objects.all(), ids)
+        else:
+            rows[entity] = {
+                pk: serializer_class(obj, context=context).data
+                for pk, obj in serializer_class.Meta.model.objects.in_bulk(ids).items()
+            }
+
+    changes = []
+    for entry in latest.values():
+        data = rows.get(entry.entity, {}).get(entry.object_id)
+        changes.append({
+            'seq': entry.seq,
+            'entity': entry.entity,
+            'operation': entry.operation,
+            'id': entry.object_id,
+            'mobile_id': entry.mobile_id,
+            # None for deletes, and for rows deleted after this change
+            'data': data,
+        })
+    return changes
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def pull_changes(request):
+    """
+    Return the authenticated user's changes after ?after=<seq>, in sequence order.
+
+    Without `after`, only the current last_seq is returned: record it, do a
+    full pull through the list endpoints, then poll with ?after=<last_seq>.
+    Keep passing the returned last_seq while has_more is true. Clients whose
+    `after` predates compaction get 410 Gone and must resync from scratch.
+    """
+    changes = ChangeLogEntry.objects.filter(user=request.user, seq__isnull=False)
+    after = request.query_params.get('after')
+    if after is None:
+        last_seq = changes.aggregate(last_seq=models.Max('seq'))['last_seq'] or 0
+        return Response({'changes': [], 'last_seq': last_seq, 'has_more': False})
+
+    try:
+        after = int(after)
+    except ValueError:
+        return Response({'error': 'after must be an integer sequence number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    sequence = ChangeSequence.objects.filter(pk=1).first()
+    if sequence is not None and after < sequence.compacted_through:
+        return Response(
+            {'error': 'Changes after this sequence number have been compacted. Resync from scratch'},
+            status=status.HTTP_410_GONE
+        )
+
+    page_size = SyncCursorPagination().get_page_size(request)
+    entries = list(changes.filter(seq__gt=after).order_by('seq')[:page_size + 1])
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+
+    return Response({
+        'changes': serialize_changes(entries, {'request': request}),
+        'last_seq': entries[-1].seq if entries else after,
+        'has_more': has_more,
+    })
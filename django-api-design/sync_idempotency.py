@@ -0,0 +1,209 @@
+"""
+Django API Design for Idempotent Sync Requests
+
+This file outlines the Idempotency-Key support for the sync endpoints.
+The response to the first request for each (user, scope, key) is stored for
+SYNC_IDEMPOTENCY_TTL seconds and replayed on retry, with its Location and
+X-Sync-Batch-Size headers, without touching the entity tables. A duplicate
+that arrives while the first request is still running waits for it to
+finish instead of racing it.
+"""
+
+# Models
+from django.db import models
+from django.contrib.auth.models import User
+
+class IdempotencyRecord(models.Model):
+    """
+    Model for the stored outcome of an idempotent request.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_records')
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('processing', 'Processing'),
+            ('completed', 'Completed'),
+        ],
+        default='processing'
+    )
+    response_status = models.IntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    # The STORED_HEADERS the response carried
+    response_headers = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Idempotency Record {self.scope} {self.key} - User {self.user_id}"
+
+
+# Decorator
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+POLL_INTERVAL = 0.2
+
+# Response headers replayed with the stored body: the status URL of a queued
+# sync and the batch size advertised by backpressure
+STORED_HEADERS = ('Location', 'X-Sync-Batch-Size')
+
+
+def fingerprint(request):
+    """
+    Return a hash of the request body, used to reject a key reused for a different request.
+    """
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def purge_expired_idempotency_records():
+    """
+    Delete stored responses whose TTL has passed.
+    """
+    IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+def _acquire(user, scope, key, request_hash):
+    """
+    Claim (user, scope, key) for this request, or produce the response to return instead.
+
+    Returns (record, None) when the caller should process the request, and
+    (None, response) when a stored or error response should be returned.
+    """
+    ttl = timedelta(seconds=getattr(settings, 'SYNC_IDEMPOTENCY_TTL', 24 * 60 * 60))
+    lock_timeout = timedelta(seconds=getattr(settings, 'SYNC_IDEMPOTENCY_LOCK_TIMEOUT', 600))
+    deadline = time.monotonic() + getattr(settings, 'SYNC_IDEMPOTENCY_WAIT', 30)
+
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    user=user,
+                    scope=scope,
+                    key=key,
+                    request_hash=request_hash,
+                    locked_at=now,
+                    expires_at=now + ttl
+                )
+            return record, None
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.filter(user=user, scope=scope, key=key).first()
+        if record is None:
+            # Deleted between our insert and this read; try again
+            continue
+
+        if record.expires_at <= now:
+            IdempotencyRecord.objects.filter(pk=record.pk, expires_at=record.expires_at).delete()
+            continue
+
+        if record.request_hash != request_hash:
+            return None, Response(
+                {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        if record.status == 'completed':
+            return None, Response(
+                record.response_body,
+                status=record.response_status,
+                headers={**(record.response_headers or {}), 'Idempotent-Replayed': 'true'}
+            )
+
+        # The first request died without finishing; take over its claim
+        if record.locked_at <= now - lock_timeout:
+            taken = IdempotencyRecord.objects.filter(
+                pk=record.pk,
+                locked_at=record.locked_at
+            ).update(locked_at=now)
+            if taken:
+                record.locked_at = now
+                return record, None
+            continue
+
+        if time.monotonic() >= deadline:
+            return None, Response(
+                {'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'}
+            )
+        time.sleep(POLL_INTERVAL)
+
+
+def idempotent(scope):
+    """
+    Make a DRF view or action replay its response for a repeated Idempotency-Key.
+
+    scope separates the key spaces of different endpoints. Views called from
+    inside another idempotent view (as sync_data calls the entity syncs) run
+    normally, since the outer view already owns the key.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key or request.method in SAFE_METHODS or getattr(request, '_idempotency_active', False):
+                return view(*args, **kwargs)
+
+            if len(key) > 255:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            record, response = _acquire(request.user, scope, key, fingerprint(request))
+            if response is not None:
+                return response
+
+            request._idempotency_active = True
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+            finally:
+                request._idempotency_active = False
+
+            # Server errors and backpressure rejections are worth retrying, so only store other outcomes
+            if (response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+                    or not hasattr(response, 'data')):
+                record.delete()
+            else:
+                record.status = 'completed'
+                record.response_status = response.status_code
+                record.response_body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+                record.response_headers = {
+                    header: response[header] for header in STORED_HEADERS if response.has_header(header)
+                }
+                record.save(update_fields=['status', 'response_status', 'response_body', 'response_headers'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,319 @@
+"""
+Django API Design for Asynchronous Sync Jobs
+
+This file outlines the models, serializers, views, worker and management
+command for running large sync uploads off the request path.
+`POST /api/sync/?async=1` stores the payload as a SyncJob and returns its id
+straight away; local worker processes drain the DB-backed queue and clients
+poll the job for progress and the final result.
+"""
+
+# Models
+import uuid
+
+from django.db import models
+from django.contrib.auth.models import User
+
+class SyncJob(models.Model):
+    """
+    Model for a queued sync upload and its outcome.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_jobs')
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('succeeded', 'Succeeded'),
+            ('failed', 'Failed'),
+        ],
+        default='queued'
+    )
+    payload = models.JSONField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched by the running worker; a running job without one for SYNC_JOB_TIMEOUT is abandoned
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Backs the worker's "oldest queued job" claim query
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Sync Job {self.id} - {self.status}"
+
+
+# Serializers
+from rest_framework import serializers
+
+class SyncJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for SyncJob status and result.
+    """
+    class Meta:
+        model = SyncJob
+        fields = (
+            'id', 'status', 'total_rows', 'processed_rows', 'attempts',
+            'result', 'error', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = fields
+
+
+# Views
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+class SyncJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for polling the status and result of the user's sync jobs.
+    """
+    serializer_class = SyncJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Return sync jobs for the authenticated user, newest first.
+        """
+        return SyncJob.objects.filter(user=self.request.user).order_by('-created_at')
+
+
+# Queue
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import HttpRequest
+from django.utils import timezone
+from rest_framework.request import Request
+from .sync_idempotency import purge_expired_idempotency_records
+from .sync_changelog import assign_sequence_numbers, compact_change_log
+from .sync_tombstones import assign_tombstone_sequence, compact_tombstones
+from .farm_summary import reconcile_farm_summaries
+
+logger = logging.getLogger('api')
+
+SYNC_ENTITY_KEYS = ('farms', 'boundary_points', 'observation_points', 'inspection_suggestions')
+
+
+def wants_async(request):
+    """
+    Return True if a sync upload asked to be queued as a SyncJob.
+    """
+    return request.query_params.get('async') in ('1', 'true')
+
+
+def enqueue_sync_job(user, payload):
+    """
+    Store a sync payload as a queued job.
+    """
+    total_rows = sum(
+        len(payload[key]) for key in SYNC_ENTITY_KEYS
+        if isinstance(payload.get(key), list)
+    )
+    return SyncJob.objects.create(user=user, payload=payload, total_rows=total_rows)
+
+
+def claim_next_job():
+    """
+    Atomically mark the oldest queued job as running and return it.
+
+    SKIP LOCKED lets several workers poll the queue without blocking on each other.
+    """
+    with transaction.atomic():
+        job = (
+            SyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'attempts'])
+    return job
+
+
+def own_run(job):
+    """
+    Return the queryset matching job only while this worker's attempt still owns it.
+
+    A job requeued as stale and claimed again has a higher attempts count,
+    so the earlier worker's writes match nothing.
+    """
+    return SyncJob.objects.filter(pk=job.pk, status='running', attempts=job.attempts)
+
+
+def keep_alive(job, stopped):
+    """
+    Touch the job's heartbeat every SYNC_JOB_HEARTBEAT_INTERVAL until stopped is set.
+
+    Runs in a thread next to run_job, so a long chunk does not make the job look abandoned.
+    """
+    interval = getattr(settings, 'SYNC_JOB_HEARTBEAT_INTERVAL', 30)
+    try:
+        while not stopped.wait(interval):
+            if not own_run(job).update(heartbeat_at=timezone.now()):
+                return
+    finally:
+        connection.close()
+
+
+def requeue_stale_jobs():
+    """
+    Requeue jobs whose worker died mid-run, or fail them after too many attempts.
+
+    A job is judged by its heartbeat rather than its start, so long jobs whose
+    worker is alive are left alone. Re-running a job is safe because every
+    entity sync upserts by mobile_id.
+    """
+    timeout = getattr(settings, 'SYNC_JOB_TIMEOUT', 600)
+    max_attempts = getattr(settings, 'SYNC_JOB_MAX_ATTEMPTS', 3)
+    horizon = timezone.now() - timedelta(seconds=timeout)
+    stale = SyncJob.objects.filter(status='running').filter(
+        # Jobs claimed before heartbeats were recorded fall back to their start
+        Q(heartbeat_at__lt=horizon) | Q(heartbeat_at__isnull=True, started_at__lt=horizon)
+    )
+    stale.filter(attempts__lt=max_attempts).update(status='queued', processed_rows=0)
+    stale.filter(attempts__gte=max_attempts).update(
+        status='failed',
+        error='Worker timed out',
+        finished_at=timezone.now()
+    )
+
+
+def build_job_request(job):
+    """
+    Build a DRF request carrying the job's user and payload for run_sync.
+    """
+    http_request = HttpRequest()
+    http_request.method = 'POST'
+    request = Request(http_request)
+    request.user = job.user
+    request._full_data = job.payload
+    # Workers process the whole payload at their own pace
+    request._backpressure_active = True
+    return request
+
+
+def run_job(job):
+    """
+    Process one claimed job and store its result.
+    """
+    from .views import run_sync
+
+    def on_progress(entity, rows):
+        job.processed_rows += rows
+        own_run(job).update(processed_rows=job.processed_rows, heartbeat_at=timezone.now())
+
+    stopped = threading.Event()
+    heartbeat = threading.Thread(target=keep_alive, args=(job, stopped), daemon=True)
+    heartbeat.start()
+    try:
+        job.result = run_sync(build_job_request(job), on_progress=on_progress)
+        job.status = 'succeeded'
+        # The payload is only needed until the job succeeds
+        job.payload = None
+    except Exception as e:
+        logger.exception('Sync job %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        stopped.set()
+        heartbeat.join()
+
+    job.finished_at = timezone.now()
+    fields = {'status': job.status, 'result': job.result, 'error': job.error, 'payload': job.payload,
+              'processed_rows': job.processed_rows, 'finished_at': job.finished_at}
+    if not own_run(job).update(**fields):
+        # Requeued after a lost heartbeat; the current attempt reports the outcome
+        logger.warning('Sync job %s was taken over before attempt %s finished', job.pk, job.attempts)
+
+
+def work(poll_interval=1.0, once=False):
+    """
+    Drain the queue until interrupted, or until it is empty if once is set.
+    """
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            requeue_stale_jobs()
+            purge_expired_idempotency_records()
+            compact_tombstones()
+            compact_change_log()
+            reconcile_farm_summaries()
+            # Picks up entries and tombstones whose after-commit sequencing failed
+            assign_sequence_numbers()
+            assign_tombstone_sequence()
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+
+
+# Management command (management/commands/run_sync_worker.py)
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+class Command(BaseCommand):
+    """
+    Run local worker processes that drain the sync job queue.
+    """
+    help = 'Process queued sync jobs with local worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=getattr(settings, 'SYNC_JOB_WORKERS', 2),
+            help='Number of worker processes to run.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty.'
+        )
+
+    def handle(self, *args, **options):
+        worker_kwargs = {'poll_interval': options['poll_interval'], 'once': options['once']}
+
+        if options['processes'] <= 1:
+            work(**worker_kwargs)
+            return
+
+        # Forked children must open their own database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work, kwargs=worker_kwargs)
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} sync workers")
+
+        for process in processes:
+            process.join()
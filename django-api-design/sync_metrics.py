@@ -0,0 +1,213 @@
+"""
+Django API Design for Query Metrics
+
+This file outlines the middleware that counts and times every SQL query per
+request through connection execute wrappers. The totals are returned in a
+`Server-Timing` header, aggregated into per-endpoint histograms, and exposed
+in Prometheus text format on an internal /metrics endpoint. Requests that go
+over SYNC_QUERY_BUDGET queries are logged with their most repeated statement,
+which is usually the N+1.
+
+Histograms are kept per process; scrape every worker, or run one worker per
+container, to get the full picture. Queries run while a streaming response
+is being consumed happen after the middleware returns and are not counted.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger('api')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class EndpointMetrics:
+    """
+    Histograms recorded for one (method, endpoint) pair.
+    """
+
+    def __init__(self):
+        self.request_seconds = Histogram(DURATION_BUCKETS)
+        self.db_seconds = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.over_budget = 0
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def record(method, endpoint, request_seconds, db_seconds, queries, over_budget):
+    with _registry_lock:
+        metrics = _registry.setdefault((method, endpoint), EndpointMetrics())
+        metrics.request_seconds.observe(request_seconds)
+        metrics.db_seconds.observe(db_seconds)
+        metrics.queries.observe(queries)
+        metrics.over_budget += int(over_budget)
+
+
+class QueryStats:
+    """
+    Execute wrapper that counts and times the queries of one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+
+class QueryMetricsMiddleware:
+    """
+    Count and time the SQL queries of every request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+            f'total;dur={elapsed * 1000:.2f}'
+        )
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match else 'unmatched'
+        budget = getattr(settings, 'SYNC_QUERY_BUDGET', None)
+        over_budget = budget is not None and stats.count > budget
+        if over_budget:
+            statement, repeats = stats.statements.most_common(1)[0]
+            logger.warning(
+                '%s %s ran %d queries (budget %d) in %.1fms; most repeated (%dx): %s',
+                request.method, request.path, stats.count, budget,
+                stats.seconds * 1000, repeats, statement[:500]
+            )
+
+        record(request.method, endpoint, elapsed, stats.seconds, stats.count, over_budget)
+        return response
+
+
+def render_metrics():
+    """
+    Render every endpoint's histograms in Prometheus text exposition format.
+    """
+    from .sync_backpressure import get_backpressure_stats
+    from .sync_cache import get_cache_stats
+
+    lines = [
+        '# HELP api_request_duration_seconds Request latency per endpoint.',
+        '# TYPE api_request_duration_seconds histogram',
+    ]
+    with _registry_lock:
+        snapshot = sorted(_registry.items())
+        for (method, endpoint), metrics in snapshot:
+            lines += metrics.request_seconds.render(
+                'api_request_duration_seconds', f'method="{method}",endpoint="{endpoint}"'
+            )
+        lines += [
+            '# HELP api_db_duration_seconds Time spent in SQL per request.',
+            '# TYPE api_db_duration_seconds histogram',
+        ]
+        for (method, endpoint), metrics in snapshot:
+            lines += metrics.db_seconds.render(
+                'api_db_duration_seconds', f'method="{method}",endpoint="{endpoint}"'
+            )
+        lines += [
+            '# HELP api_db_queries SQL queries per request.',
+            '# TYPE api_db_queries histogram',
+        ]
+        for (method, endpoint), metrics in snapshot:
+            lines += metrics.queries.render(
+                'api_db_queries', f'method="{method}",endpoint="{endpoint}"'
+            )
+        lines += [
+            '# HELP api_query_budget_exceeded_total Requests over SYNC_QUERY_BUDGET.',
+            '# TYPE api_query_budget_exceeded_total counter',
+        ]
+        for (method, endpoint), metrics in snapshot:
+            lines.append(
+                f'api_query_budget_exceeded_total{{method="{method}",endpoint="{endpoint}"}} '
+                f'{metrics.over_budget}'
+            )
+
+    cache_stats = get_cache_stats()
+    lines += [
+        '# HELP api_pending_sync_cache_requests_total pending_sync cache lookups.',
+        '# TYPE api_pending_sync_cache_requests_total counter',
+        f'api_pending_sync_cache_requests_total{{result="hit"}} {cache_stats["hits"]}',
+        f'api_pending_sync_cache_requests_total{{result="miss"}} {cache_stats["misses"]}',
+    ]
+
+    backpressure_stats = get_backpressure_stats()
+    lines += [
+        '# HELP api_sync_batch_size Rows per upload advertised in X-Sync-Batch-Size.',
+        '# TYPE api_sync_batch_size gauge',
+        f'api_sync_batch_size {backpressure_stats["recommended_batch_size"]}',
+        '# HELP api_sync_rejected_total Uploads rejected with 429 while at capacity.',
+        '# TYPE api_sync_rejected_total counter',
+        f'api_sync_rejected_total {backpressure_stats["rejected"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """
+    Internal Prometheus endpoint, restricted to METRICS_ALLOWED_IPS.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1'])
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
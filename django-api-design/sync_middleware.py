@@ -0,0 +1,82 @@
+"""
+Django API Design for Sync Middleware
+
+This file outlines the middleware that compresses sync traffic in both
+directions: gzip-encoded request bodies are inflated with a size cap, and
+responses above a size threshold are gzipped for clients that accept it.
+"""
+
+import zlib
+from io import BytesIO
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.deprecation import MiddlewareMixin
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class GzipRequestMiddleware(MiddlewareMixin):
+    """
+    Inflate request bodies sent with `Content-Encoding: gzip`.
+
+    Output is capped at SYNC_MAX_DECOMPRESSED_BODY bytes so a small
+    compressed body cannot expand into a decompression bomb.
+    """
+
+    def process_request(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding != 'gzip':
+            return None
+
+        limit = getattr(settings, 'SYNC_MAX_DECOMPRESSED_BODY', 50 * 1024 * 1024)
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        body = bytearray()
+
+        try:
+            while True:
+                chunk = request.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                body += decompressor.decompress(chunk, limit - len(body) + 1)
+                if len(body) > limit or decompressor.unconsumed_tail:
+                    return self._too_large(limit)
+            body += decompressor.flush()
+        except zlib.error:
+            return JsonResponse({'error': 'Invalid gzip request body'}, status=400)
+
+        if len(body) > limit:
+            return self._too_large(limit)
+        if not decompressor.eof:
+            return JsonResponse({'error': 'Truncated gzip request body'}, status=400)
+
+        # Present the inflated body to Django and DRF as if it was sent plain
+        body = bytes(body)
+        request._body = body
+        request._stream = BytesIO(body)
+        request._read_started = False
+        request.META['CONTENT_LENGTH'] = str(len(body))
+        del request.META['HTTP_CONTENT_ENCODING']
+        return None
+
+    def _too_large(self, limit):
+        return JsonResponse(
+            {'error': f'Decompressed request body exceeds {limit} bytes'},
+            status=413
+        )
+
+
+class SyncGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware with a configurable minimum response size.
+
+    Responses below SYNC_GZIP_MIN_LENGTH bytes cost more CPU to compress than
+    they save on the wire. Streaming NDJSON responses are always compressed.
+    """
+
+    def process_response(self, request, response):
+        min_length = getattr(settings, 'SYNC_GZIP_MIN_LENGTH', 1024)
+        if not response.streaming and len(response.content) < min_length:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,105 @@
+"""
+Django API Design for the Columnar MessagePack Wire Format
+
+This file outlines the binary encoding negotiated by the observation point
+sync endpoints next to JSON. Clients send `Content-Type: application/x-msgpack`
+and/or `Accept: application/x-msgpack`. Row batches travel as one array per
+field instead of one object per row, e.g.
+
+    {
+        "observation_points": {
+            "id": [1, 2, 3],
+            "farm_id": [7, 7, 7],
+            "latitude": [-12.41, -12.41, -12.42],
+            "longitude": [130.86, 130.87, 130.86],
+            "segment": [1, 1, 2]
+        }
+    }
+
+Every row of a batch carries the same fields, so a field that should be left
+untouched on update is omitted as a whole column rather than sent as null.
+Requires the `msgpack` package.
+"""
+
+import msgpack
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+MSGPACK_MEDIA_TYPE = 'application/x-msgpack'
+
+
+def to_columns(rows):
+    """
+    Convert a list of row dicts sharing the same keys into a dict of columns.
+    """
+    if not rows:
+        return {}
+    return {field: [row[field] for row in rows] for field in rows[0]}
+
+
+def from_columns(columns):
+    """
+    Convert a dict of equal-length columns back into a list of row dicts.
+
+    Raises ValueError if the columns differ in length.
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError('All columns must have the same length')
+    fields = list(columns)
+    return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+
+def is_columnar(value):
+    """
+    Return True if value is a batch encoded as a dict of column arrays.
+    """
+    return isinstance(value, dict) and all(isinstance(column, list) for column in value.values())
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parser for MessagePack request bodies.
+
+    Top-level row batches sent as columns are expanded to row dicts, so the
+    sync serializers and views handle them exactly like JSON uploads.
+    """
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise ParseError(f'MessagePack parse error - {e}')
+
+        if not isinstance(data, dict):
+            raise ParseError('MessagePack body must be a map')
+
+        try:
+            return {
+                key: from_columns(value) if is_columnar(value) else value
+                for key, value in data.items()
+            }
+        except ValueError as e:
+            raise ParseError(str(e))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer for MessagePack responses.
+
+    Views decide which row lists to emit as columns (see to_columns); every
+    other value is packed as-is.
+    """
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
@@ -0,0 +1,265 @@
+"""
+Django API Design for Sync Pagination
+
+This file outlines the keyset cursor pagination used by the pending_sync
+endpoints, so pulls cost O(page) regardless of table size. Cursors also
+track the position in the tombstone log, so deletions are paged alongside
+the changed rows.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from .sync_tombstones import get_retention_horizon, serialize_tombstone
+
+# Columns a page's last row must carry for its cursor
+KEYSET_COLUMNS = ('updated_at', 'id')
+
+
+class CursorExpired(Exception):
+    """
+    Raised when a cursor predates the tombstone retention horizon.
+    """
+
+
+def _encode_position(position):
+    if position is None:
+        return None
+    timestamp, pk = position
+    return [timestamp.isoformat(), pk]
+
+
+def _decode_position(value):
+    if value is None:
+        return None
+    timestamp, pk = value
+    timestamp = parse_datetime(timestamp)
+    if timestamp is None:
+        raise ValueError('Invalid cursor')
+    return timestamp, int(pk)
+
+
+def encode_cursor(position, deleted_position=None, scanned_at=None):
+    """
+    Encode the last (updated_at, id) row position, the last tombstone
+    sequence number and the time the tombstone log was read as an opaque
+    URL-safe cursor.
+    """
+    payload = {
+        'rows': _encode_position(position),
+        'deleted': deleted_position,
+    }
+    if scanned_at is not None:
+        payload['scanned'] = scanned_at.isoformat()
+    raw = json.dumps(payload).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor into its two positions and scan time.
+
+    The scan time is None for cursors issued without one. Cursors issued
+    before tombstones were sequenced carry a (deleted_at, id) tombstone
+    position instead of a sequence number. Raises ValueError if the cursor
+    is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        scanned_at = payload.get('scanned')
+        if scanned_at is not None:
+            scanned_at = parse_datetime(scanned_at)
+            if scanned_at is None:
+                raise ValueError('Invalid cursor')
+        deleted = payload['deleted']
+        if isinstance(deleted, list):
+            deleted = _decode_position(deleted)
+        elif deleted is not None:
+            deleted = int(deleted)
+        return _decode_position(payload['rows']), deleted, scanned_at
+    except (AttributeError, KeyError, TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_after(queryset, position, field):
+    """
+    Restrict queryset to rows after a (timestamp, id) position on field.
+    """
+    if position is None:
+        return queryset
+    timestamp, pk = position
+    return queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+
+
+class SyncCursorPagination(BasePagination):
+    """
+    Keyset pagination over (updated_at, id).
+
+    The id tie-breaker means rows sharing a timestamp are never skipped, and
+    every response carries a next_cursor the client can resume from. When
+    given a Tombstone queryset, the deletions after the cursor are paged
+    alongside the rows by sequence number and tracked in the same cursor;
+    each gets its own page_size unless share_page_size is set.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, tombstones=None, deleted_since=None, page_size=None, cursor_query_param=None,
+                 share_page_size=False):
+        self.tombstones = tombstones
+        self.deleted_since = deleted_since
+        self.page_size = page_size
+        # Whether rows and tombstones together fill at most one page_size
+        self.share_page_size = share_page_size
+        if cursor_query_param is not None:
+            self.cursor_query_param = cursor_query_param
+
+    def get_page_size(self, request):
+        """
+        Return the requested page size, bounded by SYNC_MAX_PAGE_SIZE.
+
+        A page_size given to the constructor takes precedence.
+        """
+        if self.page_size is not None:
+            return self.page_size
+        page_size = getattr(settings, 'SYNC_PAGE_SIZE', 500)
+        max_page_size = getattr(settings, 'SYNC_MAX_PAGE_SIZE', 2000)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            pass
+        return max(1, min(page_size, max_page_size))
+
+    def order_after_cursor(self, queryset, request):
+        """
+        Return queryset restricted to rows after the request's cursor, in keyset order.
+
+        Raises ValueError if the cursor is malformed, and CursorExpired if
+        tombstones it still needs may have been compacted.
+        """
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        if self.cursor:
+            self.position, self.deleted_position, self.scanned_at = decode_cursor(self.cursor)
+        else:
+            self.position, self.deleted_position, self.scanned_at = None, None, None
+        if self.tombstones is not None:
+            self.start_deleted_position()
+        return keyset_after(queryset, self.position, 'updated_at').order_by(*KEYSET_COLUMNS)
+
+    def start_deleted_position(self):
+        """
+        Work out where the tombstone scan starts for this request.
+
+        A cursor expires when the tombstone log was last read before the
+        retention horizon, since tombstones written after that read may have
+        been compacted. The rows' updated_at says nothing about that: a user
+        with no recent changes still holds a current cursor.
+        """
+        # Taken before the scan, so a tombstone committed during it is read again next time
+        scan_started_at = timezone.now()
+        if self.cursor:
+            reference = self.scanned_at
+            if isinstance(self.deleted_position, tuple):
+                # Cursors issued without a scan time fall back to their last tombstone
+                reference = reference or self.deleted_position[0]
+                self.deleted_position = self.sequence_before(
+                    keyset_after(self.tombstones, self.deleted_position, 'deleted_at')
+                )
+        elif self.deleted_since is not None:
+            reference = self.deleted_since
+            self.deleted_position = self.sequence_before(self.tombstones.filter(deleted_at__gt=self.deleted_since))
+        else:
+            # A first pull has nothing local to delete; start after the newest tombstone
+            reference = None
+            self.deleted_position = self.tombstones.aggregate(seq=Max('seq'))['seq']
+        if reference is not None and reference < get_retention_horizon():
+            raise CursorExpired()
+        self.scanned_at = scan_started_at
+
+    def sequence_before(self, later):
+        """
+        Return the sequence number to resume after so that none of the later tombstones is skipped.
+
+        Translates a point in time into a position in the log. Sequence
+        order only roughly follows deleted_at, so this may resend a few
+        earlier deletions, which devices ignore.
+        """
+        first = later.aggregate(seq=Min('seq'))['seq']
+        if first is not None:
+            return first - 1
+        return self.tombstones.aggregate(seq=Max('seq'))['seq']
+
+    def deleted_after_cursor(self):
+        """
+        Return the sequenced tombstones after the request's cursor, in sequence order.
+        """
+        tombstones = self.tombstones.filter(seq__isnull=False)
+        if self.deleted_position is not None:
+            tombstones = tombstones.filter(seq__gt=self.deleted_position)
+        return tombstones.order_by('seq')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the page of rows after the request's cursor.
+
+        Raises ValueError if the cursor is malformed, and CursorExpired if it
+        last read the tombstone log before the retention horizon.
+        """
+        page_size = self.get_page_size(request)
+        queryset = self.order_after_cursor(queryset, request)
+
+        # Fetch one extra row to know whether another page follows
+        rows = list(queryset[:page_size + 1])
+        self.has_more = len(rows) > page_size
+        page = rows[:page_size]
+        if page:
+            self.position = (page[-1].updated_at, page[-1].id)
+
+        self.deleted = []
+        if self.tombstones is not None:
+            deleted_page_size = page_size - len(page) if self.share_page_size else page_size
+            deleted = list(self.deleted_after_cursor()[:deleted_page_size + 1])
+            self.has_more = self.has_more or len(deleted) > deleted_page_size
+            self.deleted = deleted[:deleted_page_size]
+            if self.deleted:
+                self.deleted_position = self.deleted[-1].seq
+            if len(deleted) > deleted_page_size:
+                # The log has only been read up to the first tombstone not sent
+                self.scanned_at = min(self.scanned_at, deleted[deleted_page_size].deleted_at)
+        return page
+
+    def get_next_cursor(self):
+        if self.position is None and self.deleted_position is None:
+            return None
+        return encode_cursor(self.position, self.deleted_position, self.scanned_at)
+
+    def get_paginated_response(self, data):
+        body = {'results': data}
+        if self.tombstones is not None:
+            body['deleted'] = [serialize_tombstone(tombstone) for tombstone in self.deleted]
+        body['next_cursor'] = self.get_next_cursor()
+        body['has_more'] = self.has_more
+        return Response(body)
+
+    def iter_deleted(self):
+        """
+        Yield an NDJSON object per tombstone after the cursor, for streamed pulls.
+        """
+        chunk_size = getattr(settings, 'SYNC_STREAM_CHUNK_SIZE', 2000)
+        for tombstone in self.deleted_after_cursor().iterator(chunk_size=chunk_size):
+            self.deleted_position = tombstone.seq
+            yield {'deleted': serialize_tombstone(tombstone)}
+
+    def get_stream_trailer(self, last):
+        """
+        Return the final NDJSON line of a streamed pull, given the last row sent.
+        """
+        if last is not None:
+            self.position = (last.updated_at, last.id)
+        return {'next_cursor': self.get_next_cursor(), 'has_more': False}
@@ -0,0 +1,117 @@
+"""
+Django API Design for Streaming Sync Responses
+
+This file outlines the opt-in NDJSON streaming mode for the pending_sync and
+list endpoints. Clients send `Accept: application/x-ndjson` and receive one
+JSON object per line, serialized row by row from a chunked queryset iterator,
+so worker memory stays flat and the first byte goes out before the last row
+is read.
+"""
+
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from .fast_serializers import values_serializer_for
+from .sync_pagination import KEYSET_COLUMNS
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def to_ndjson_line(data):
+    """
+    Encode one object as a single NDJSON line.
+    """
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renderer for newline-delimited JSON.
+
+    Streaming views bypass it with a StreamingHttpResponse; it is listed so
+    that content negotiation accepts the media type, and it renders ordinary
+    responses (such as errors) in the same format.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(to_ndjson_line(item) for item in items).encode(self.charset)
+
+
+class NDJSONStreamMixin:
+    """
+    ViewSet mixin that adds the NDJSON streaming mode to list and pending_sync.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def wants_stream(self, request):
+        """
+        Return True if the client negotiated the NDJSON streaming mode.
+        """
+        renderer = getattr(request, 'accepted_renderer', None)
+        return isinstance(renderer, NDJSONRenderer)
+
+    def iter_ndjson(self, queryset, trailer=None, tail=None):
+        """
+        Yield one NDJSON line per row, followed by an optional trailer line.
+
+        tail is an optional iterable of further dicts to emit after the rows.
+        trailer is called with the last row streamed (or None) and may return
+        a dict to emit as the final line.
+
+        Flat serializers are rendered from value rows by a ValuesSerializer;
+        the row passed to trailer then carries the keyset columns as attributes.
+        """
+        chunk_size = getattr(settings, 'SYNC_STREAM_CHUNK_SIZE', 2000)
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        values_serializer = values_serializer_for(serializer_class, context=context)
+        if values_serializer is not None:
+            rows = values_serializer.rows(queryset, extra=KEYSET_COLUMNS if trailer else ())
+            to_representation = values_serializer.to_representation
+        else:
+            rows = queryset
+
+            def to_representation(obj):
+                return serializer_class(obj, context=context).data
+        last = None
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield to_ndjson_line(to_representation(row))
+            last = row
+        for item in tail or ():
+            yield to_ndjson_line(item)
+        if trailer is not None:
+            trailer_data = trailer(last)
+            if trailer_data is not None:
+                yield to_ndjson_line(trailer_data)
+
+    def stream_response(self, queryset, trailer=None, tail=None):
+        """
+        Return a StreamingHttpResponse that serializes queryset row by row.
+        """
+        response = StreamingHttpResponse(
+            self.iter_ndjson(queryset, trailer, tail),
+            content_type=f'{NDJSON_MEDIA_TYPE}; charset=utf-8'
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """
+        List rows, streaming them as NDJSON when the client asks for it.
+        """
+        if not self.wants_stream(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.ordered:
+            queryset = queryset.order_by('id')
+        return self.stream_response(queryset)
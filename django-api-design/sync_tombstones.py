@@ -0,0 +1,279 @@
+"""
+Django API Design for Deletion Tombstones
+
+This file outlines the tombstone log that lets deletions reach devices
+incrementally. Deleting an observation point, inspection suggestion or farm
+leaves a small Tombstone row that pending_sync returns next to the changed
+rows. A farm deletion records tombstones for its cascaded points and
+suggestions in bulk, so per-entity pulls stay self-contained. Tombstones
+older than SYNC_TOMBSTONE_RETENTION are compacted by the sync workers;
+cursors older than that horizon must resync from scratch.
+
+Pulls page tombstones by a sequence number handed out after commit, like
+the change log's, rather than by deleted_at: a deletion that commits after
+a pull has read past its timestamp still gets a number above that pull's
+cursor.
+"""
+
+# Models
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .bulk_sync import get_batch_size, get_commit_chunk_size
+
+OBSERVATION_POINT = 'observation_point'
+INSPECTION_SUGGESTION = 'inspection_suggestion'
+FARM = 'farm'
+
+class Tombstone(models.Model):
+    """
+    Model recording that a synced row was deleted on the server.
+    """
+    entity = models.CharField(
+        max_length=50,
+        choices=[
+            (OBSERVATION_POINT, 'Observation Point'),
+            (INSPECTION_SUGGESTION, 'Inspection Suggestion'),
+            (FARM, 'Farm'),
+        ]
+    )
+    # Indexed by the leading column of tombstone_pull_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones', db_index=False)
+    object_id = models.BigIntegerField()
+    mobile_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    # Assigned after commit by assign_tombstone_sequence; pulls page by it
+    seq = models.BigIntegerField(unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # pending_sync keyset scan over a user's tombstones of one entity
+            models.Index(fields=['user', 'entity', 'seq'], name='tombstone_pull_idx'),
+            # Only the tombstones still waiting for a sequence number
+            models.Index(
+                fields=['id'],
+                name='tombstone_unsequenced_idx',
+                condition=models.Q(seq__isnull=True)
+            ),
+            # Compaction
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tombstone {self.entity} {self.object_id} - User {self.user_id}"
+
+
+class TombstoneSequence(models.Model):
+    """
+    Singleton row holding the last assigned tombstone sequence number.
+    """
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Tombstone sequence at {self.value}"
+
+
+def serialize_tombstone(tombstone):
+    """
+    Return the representation of a tombstone sent to devices.
+    """
+    return {
+        'id': tombstone.object_id,
+        'mobile_id': tombstone.mobile_id,
+        'deleted_at': tombstone.deleted_at.isoformat(),
+    }
+
+
+# Recording
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger('api')
+
+
+def record_tombstones(tombstones):
+    """
+    Insert Tombstone instances in the caller's transaction.
+
+    They are sequenced once that transaction commits.
+    """
+    if not tombstones:
+        return
+    record_tombstones(tombstones)
+    transaction.on_commit(_sequence_after_commit)
+
+
+def assign_tombstone_sequence():
+    """
+    Give committed, unsequenced tombstones the next sequence numbers.
+
+    Sequencers are serialized by the TombstoneSequence row, so sequence
+    order is the order tombstones become visible to pulls, whenever their
+    deletions happened. Returns the number of tombstones sequenced.
+    """
+    if not Tombstone.objects.filter(seq__isnull=True).exists():
+        return 0
+    batch = get_commit_chunk_size()
+    total = 0
+    while True:
+        with transaction.atomic():
+            sequence, _ = TombstoneSequence.objects.select_for_update().get_or_create(pk=1)
+            pending = list(Tombstone.objects.filter(seq__isnull=True).order_by('id')[:batch])
+            for tombstone in pending:
+                sequence.value += 1
+                tombstone.seq = sequence.value
+            Tombstone.objects.bulk_update(pending, ['seq'], batch_size=get_batch_size())
+            sequence.save(update_fields=['value'])
+        total += len(pending)
+        if len(pending) < batch:
+            return total
+
+
+def _sequence_after_commit():
+    # The deletion itself is committed; a failed sequencing run is retried by the sync workers
+    try:
+        assign_tombstone_sequence()
+    except Exception:
+        logger.exception('Sequencing tombstones failed')
+
+
+# Retention
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+_last_compaction = 0.0
+
+
+def get_retention_horizon():
+    """
+    Return the oldest point in time tombstones are still kept for.
+    """
+    retention = getattr(settings, 'SYNC_TOMBSTONE_RETENTION', 90 * 24 * 60 * 60)
+    return timezone.now() - timedelta(seconds=retention)
+
+
+def compact_tombstones(force=False):
+    """
+    Delete tombstones older than the retention horizon.
+
+    Runs at most once per SYNC_TOMBSTONE_COMPACT_INTERVAL per process unless
+    force is set. Returns the number of tombstones deleted.
+    """
+    global _last_compaction
+    interval = getattr(settings, 'SYNC_TOMBSTONE_COMPACT_INTERVAL', 60 * 60)
+    if not force and time.monotonic() - _last_compaction < interval:
+        return 0
+    _last_compaction = time.monotonic()
+    # Unsequenced tombstones wait for their number, so no pull can skip them
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=get_retention_horizon(), seq__isnull=False).delete()
+    return deleted
+
+
+# Signals
+from django.apps import apps
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+
+def origin_model_name(origin):
+    """
+    Return the model name of a delete signal's origin (an instance or a queryset).
+    """
+    if origin is None:
+        return None
+    model = getattr(origin, 'model', None) or type(origin)
+    return model._meta.model_name
+
+
+def covered_by_cascade(origin):
+    """
+    Return True if the farm or user being deleted already accounts for this row.
+    """
+    return origin_model_name(origin) in ('farm', 'user')
+
+
+def covered_by_caller(origin):
+    """
+    Return True if the delete's caller already accounts for this row.
+
+    That is a farm or user cascade, or a QuerySet.delete(): bulk deletes
+    record their tombstones, change log entries, summary counts and cache
+    invalidation themselves, as generate_layout does, rather than paying
+    for them row by row.
+    """
+    return covered_by_cascade(origin) or isinstance(origin, models.QuerySet)
+
+
+def farm_owner_id(instance):
+    """
+    Return the id of the user owning the farm of a point or boundary point.
+
+    Uses the farm if it is already loaded and otherwise reads only its
+    user_id, once per instance and farm, so the receivers of one save or
+    delete share a single query. Callers that know the owner can set it up
+    front with instance._farm_owner = (farm_id, user_id).
+    """
+    cached = getattr(instance, '_farm_owner', None)
+    if cached is not None and cached[0] == instance.farm_id:
+        return cached[1]
+    farm = instance._state.fields_cache.get('farm')
+    if farm is not None and farm.pk == instance.farm_id:
+        user_id = farm.user_id
+    else:
+        user_id = (
+            apps.get_model('api', 'Farm').objects
+            .filter(pk=instance.farm_id).values_list('user_id', flat=True).first()
+        )
+    instance._farm_owner = (instance.farm_id, user_id)
+    return user_id
+
+
+@receiver(post_delete, sender='api.ObservationPoint')
+def record_observation_point_tombstone(sender, instance, origin=None, **kwargs):
+    if covered_by_caller(origin):
+        return
+    record_tombstones([Tombstone(
+        entity=OBSERVATION_POINT,
+        user_id=farm_owner_id(instance),
+        object_id=instance.pk,
+        mobile_id=instance.mobile_id
+    )])
+
+
+@receiver(post_delete, sender='api.InspectionSuggestion')
+def record_inspection_suggestion_tombstone(sender, instance, origin=None, **kwargs):
+    if covered_by_caller(origin):
+        return
+    record_tombstones([Tombstone(
+        entity=INSPECTION_SUGGESTION,
+        user_id=instance.user_id,
+        object_id=instance.pk,
+        mobile_id=instance.mobile_id
+    )])
+
+
+@receiver(pre_delete, sender='api.Farm')
+def record_farm_tombstones(sender, instance, origin=None, **kwargs):
+    # A deleted user has no devices left to tell
+    if origin_model_name(origin) == 'user':
+        return
+    tombstones = [
+        Tombstone(
+            entity=FARM,
+            user_id=instance.user_id,
+            object_id=instance.pk,
+            mobile_id=getattr(instance, 'mobile_id', None)
+        )
+    ]
+    for entity, related in (
+        (OBSERVATION_POINT, instance.observation_points),
+        (INSPECTION_SUGGESTION, instance.inspection_suggestions),
+    ):
+        tombstones += [
+            Tombstone(entity=entity, user_id=instance.user_id, object_id=pk, mobile_id=mobile_id)
+            for pk, mobile_id in related.values_list('id', 'mobile_id')
+        ]
+    record_tombstones(tombstones)
@@ -20,6 +20,8 @@ class UserProfile(models.Model):
     last_name = models.CharField(max_length=100, blank=True, null=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # Storage names of resized copies of profile_picture, keyed by variant name
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     bio = models.TextField(blank=True, null=True)
     company = models.CharField(max_length=100, blank=True, null=True)
     job_title = models.CharField(max_length=100, blank=True, null=True)
@@ -69,11 +71,29 @@ class UserProfileSerializer(serializers.ModelSerializer):
     Serializer for UserProfile model.
     """
     user = UserSerializer(read_only=True)
+    profile_picture_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at', 'last_synced', 'sync_status')
+    
+    def get_profile_picture_variants(self, obj):
+        """
+        Return the URL of each resized variant, or None until it has been rendered.
+        """
+        from .image_variants import PROFILE_PICTURE_VARIANTS
+        
+        request = self.context.get('request')
+        variants = {}
+        for name in PROFILE_PICTURE_VARIANTS:
+            storage_name = obj.profile_picture_variants.get(name)
+            if storage_name:
+                url = obj.profile_picture.storage.url(storage_name)
+                variants[name] = request.build_absolute_uri(url) if request else url
+            else:
+                variants[name] = None
+        return variants
 
 
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
@@ -138,6 +158,33 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.utils.encoders import JSONEncoder
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+import hashlib
+import json
+
+PROFILE_SYNC_CACHE_KEY = 'profile-sync:last-synced:{user_id}'
+
+
+def profile_etag(data):
+    """
+    Return a strong ETag for serialized profile data, including the nested user fields.
+    """
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return quote_etag(hashlib.sha256(body.encode('utf-8')).hexdigest())
+
+
+def etag_matches(etag, if_none_match):
+    """
+    Return True if an If-None-Match header value matches etag (weak comparison).
+    """
+    if not if_none_match:
+        return False
+    candidates = parse_etags(if_none_match)
+    return '*' in candidates or any(
+        candidate.removeprefix('W/') == etag for candidate in candidates
+    )
 
 class UserProfileViewSet(viewsets.ModelViewSet):
     """
@@ -205,6 +252,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             
             # Set new password
             user.set_password(serializer.validated_data['new_password'])
+            # Saving the user also drops its cached token resolution
             user.save()
             
             return Response({'status': 'password set'})
@@ -220,7 +268,13 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def upload_picture(self, request):
         """
         Upload a profile picture.
+        
+        The whole image is sent in one request; clients on poor connections
+        should use the resumable /api/profile-picture-uploads/ endpoint.
+        Resized variants are rendered in the background.
         """
+        from .profile_picture_upload import schedule_picture_variants
+        
         profile = self.get_object()
         serializer = ProfilePictureSerializer(profile, data=request.data, partial=True)
         
@@ -228,11 +282,14 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             serializer.save()
             
             # Update sync status
+            profile.profile_picture_variants = {}
             profile.last_synced = timezone.now()
             profile.sync_status = 'synced'
             profile.save()
             
-            return Response(UserProfileSerializer(profile).data)
+            schedule_picture_variants(profile)
+            
+            return Response(UserProfileSerializer(profile, context=self.get_serializer_context()).data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -241,17 +298,22 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         """
         Sync the user profile from the mobile app.
         
-        This endpoint returns the latest profile data from the server.
+        This endpoint returns the latest profile data from the server. It never
+        writes the profile row: the response carries a strong ETag, a matching
+        If-None-Match is answered with 304 and no body, and the sync time is
+        recorded in the cache.
         """
         profile = self.get_object()
+        serializer = self.get_serializer(profile)
+        etag = profile_etag(serializer.data)
         
-        # Update last_synced timestamp
-        profile.last_synced = timezone.now()
-        profile.sync_status = 'synced'
-        profile.save()
+        # Record the sync time without touching the profile row
+        cache.set(PROFILE_SYNC_CACHE_KEY.format(user_id=request.user.pk), timezone.now(), timeout=None)
         
-        serializer = self.get_serializer(profile)
-        return Response(serializer.data)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(serializer.data, headers=headers)
 
 
 # URLs